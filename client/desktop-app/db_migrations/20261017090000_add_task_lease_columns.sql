@@ -0,0 +1,8 @@
+-- Leasing columns so several workers / processes can drain the task table without double-processing.
+ALTER TABLE task ADD COLUMN leased_by TEXT;
+ALTER TABLE task ADD COLUMN lease_expires_at DATETIME;
+
+-- Claim order for pending tasks: highest priority first, then oldest first.
+CREATE INDEX idx_task_claim ON task(status, priority DESC, created_at);
+-- Expired leases lookup, only leased rows are indexed.
+CREATE INDEX idx_task_lease_expires_at ON task(lease_expires_at) WHERE status = 'leased';
@@ -0,0 +1,22 @@
+-- Last analysis of each hyper_node, so the reasoning engine can skip unchanged nodes and only re-run changed stages.
+CREATE TABLE hyper_node_analysis (
+    hyper_node_id TEXT PRIMARY KEY,
+
+    -- File fingerprint at analysis time.
+    fs_inode INTEGER,
+    fs_file_size INTEGER,
+    fs_mtime_ns INTEGER,
+    fs_sampled_hash TEXT,
+
+    -- Inputs of each stage, a stage is re-run only when its input changed.
+    markdown_hash TEXT,
+    summary_signature TEXT,
+
+    -- Stage outputs reused when a stage is skipped.
+    summary TEXT,
+    metadata TEXT,
+
+    analyzed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (hyper_node_id) REFERENCES hyper_node(id)
+);
@@ -0,0 +1,253 @@
+"""
+Micro-benchmarks of the text processing hot paths: tokenization, the TextChunker strategies, the structure chunker
+and TextRank reduction, on synthetic markdown of fixed sizes and on real markdown / docling json files.
+Reports wall time, tokenizer calls and peak Python memory per case and corpus, and compares against a json baseline.
+
+    POCKET_GITHUB_PATH=... python lab/benchmarks/benchmark_chunking.py [--sizes 10KB,1MB,50MB] [--corpus docs/]
+        [--tokenizer path/to/tokenizer] [--output current.json] [--baseline lab/benchmarks/baseline.json]
+
+The tokenizer is the summarizer one from the local models directory unless --tokenizer points to another local one.
+Real corpora are .md files (markdown cases) and .json docling exports (structure chunker); --corpus takes files or
+folders. With --baseline, cases slower than --tolerance, or with more tokenizer calls, are listed and the exit code
+is 1, so regressions show up in review.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "service" / "python" / "reasoning-engine"))
+
+from transformers import AutoTokenizer
+
+from src.config.models_config                          import ModelsConfig
+from src.domain.on_metal.nlp.chunker.text_chunker      import TextChunker, guestimate_overlap_tokens
+from src.domain.on_metal.nlp.chunker.structure_chunker import StructureChunker
+from src.domain.on_metal.nlp.extractive.text_rank      import TextRank
+from src.domain.on_metal.nlp.tokenized_document        import TokenizedDocument
+
+DEFAULT_SIZES = "10KB,100KB,1MB,10MB"
+SIZE_UNITS    = {"KB": 1024, "MB": 1024 ** 2}
+# Fixed seed and vocabulary, so runs on different hosts are comparable.
+SEED          = 20240601
+WORDS         = (
+    "analysis budget contract data document energy facility glacier index lease meeting network option plugin "
+    "quarter report revenue satellite search summary system tenant update valley water year the of and to in "
+    "is for with on by an be as at this that from are was were it or not which their has have will"
+).split()
+
+
+class CountingTokenizer:
+    """Forwards to a tokenizer and counts the calls that tokenize or decode text."""
+    COUNTED = ("__call__", "encode", "decode", "batch_decode", "pad")
+
+    def __init__(self, tokenizer):
+        self._tokenizer = tokenizer
+        self.calls      = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self._tokenizer(*args, **kwargs)
+
+    def __len__(self):
+        return len(self._tokenizer)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._tokenizer, name)
+        if name in self.COUNTED and callable(attribute):
+            def counted(*args, **kwargs):
+                self.calls += 1
+                return attribute(*args, **kwargs)
+            return counted
+        return attribute
+
+
+def parse_size(size):
+    size = size.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * factor)
+    return int(size)
+
+
+def synthetic_document(num_bytes, seed=SEED):
+    """Markdown of about `num_bytes` (headings, paragraphs, lists, tables) and the docling document of the same content."""
+    rng = random.Random(seed)
+    texts, groups, tables, body = [], [], [], []
+    markdown, size, page = [], 0, 1
+
+    def sentence():
+        words = rng.choices(WORDS, k=rng.randint(6, 24))
+        return " ".join(words).capitalize() + "."
+
+    def add_text(label, text, **extra):
+        texts.append({"self_ref": f"#/texts/{len(texts)}", "label": label, "text": text, "prov": [{"page_no": page}], "children": [], **extra})
+        return {"$ref": f"#/texts/{len(texts) - 1}"}
+
+    section = 0
+    while size < num_bytes:
+        section += 1
+        page    = 1 + section // 3
+        heading = f"Section {section} {rng.choice(WORDS)}"
+        body.append(add_text("section_header", heading, level=1 + section % 2))
+        markdown.append(f"{'#' * (2 + section % 2)} {heading}")
+        for _ in range(rng.randint(2, 6)):
+            paragraph = " ".join(sentence() for _ in range(rng.randint(2, 8)))
+            body.append(add_text("text", paragraph))
+            markdown.append(paragraph)
+        if section % 3 == 0:
+            items = [sentence() for _ in range(rng.randint(3, 10))]
+            groups.append({"self_ref": f"#/groups/{len(groups)}", "label": "list", "children": [add_text("list_item", item) for item in items]})
+            body.append({"$ref": f"#/groups/{len(groups) - 1}"})
+            markdown.append("\n".join(f"- {item}" for item in items))
+        if section % 5 == 0:
+            grid = [[{"text": f"column {c}"} for c in range(4)]] + [[{"text": rng.choice(WORDS)} for _ in range(4)] for _ in range(rng.randint(3, 20))]
+            tables.append({"self_ref": f"#/tables/{len(tables)}", "label": "table", "prov": [{"page_no": page}], "captions": [], "children": [], "data": {"grid": grid}})
+            body.append({"$ref": f"#/tables/{len(tables) - 1}"})
+            rows = ["| " + " | ".join(cell["text"] for cell in row) + " |" for row in grid]
+            markdown.append("\n".join(rows[:1] + ["|---|---|---|---|"] + rows[1:]))
+        size = sum(len(block) + 2 for block in markdown)
+
+    docling = {"body": {"children": body}, "texts": texts, "groups": groups, "tables": tables}
+    return "\n\n".join(markdown), docling
+
+
+def load_corpora(sizes, paths):
+    """(name, markdown, docling document or None) for every synthetic size and real file."""
+    corpora = []
+    for size in sizes:
+        markdown, docling = synthetic_document(parse_size(size))
+        corpora.append((f"synthetic-{size.strip()}", markdown, docling))
+    for path in paths:
+        path  = Path(path)
+        files = sorted(path.rglob("*")) if path.is_dir() else [path]
+        for file in files:
+            if file.suffix == ".md":
+                corpora.append((file.name, file.read_text(encoding="utf-8"), None))
+            elif file.suffix == ".json":
+                corpora.append((file.name, None, json.loads(file.read_text(encoding="utf-8"))))
+    return corpora
+
+
+def cases(max_input_tokens):
+    """Benchmarked calls by name; each gets the markdown, the docling document and a counting tokenizer."""
+    return {
+        "tokenize":                        lambda md, doc, tok: TokenizedDocument(md).ids(tok),
+        "_chunk":                          lambda md, doc, tok: TextChunker._chunk(md, max(1, len(md) // 16000), tok, 0, guestimate_overlap_tokens),
+        "split_for_map_reduce":            lambda md, doc, tok: TextChunker.split_for_map_reduce(md, tok),
+        "window_chunks":                   lambda md, doc, tok: TextChunker.window_chunks(md, tok, max_input_tokens, guestimate_overlap_tokens),
+        "iter_window_chunks":              lambda md, doc, tok: sum(1 for _ in TextChunker.iter_window_chunks(TokenizedDocument(md), tok, max_input_tokens, guestimate_overlap_tokens)),
+        "text_rank_reduce":                lambda md, doc, tok: TextRank.reduce(md, tokenizer=tok),
+        "structure_chunks":                lambda md, doc, tok: StructureChunker.chunk(doc, tok),
+    }
+
+
+def measure(case, markdown, docling, tokenizer, repeats):
+    counting = CountingTokenizer(tokenizer)
+    gc.collect()
+    tracemalloc.start()
+    case(markdown, docling, counting)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Timed apart from the traced run, tracemalloc slows allocations down.
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        case(markdown, docling, tokenizer)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "wall_seconds_min":    round(min(timings), 4),
+        "wall_seconds_median": round(statistics.median(timings), 4),
+        "tokenizer_calls":     counting.calls,
+        "peak_python_mb":      round(peak_bytes / 1024 ** 2, 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against `baseline`: slower beyond tolerance, or more tokenizer calls."""
+    previous    = {(r["corpus"], r["case"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["corpus"], result["case"]))
+        if before is None:
+            continue
+        if result["wall_seconds_min"] > before["wall_seconds_min"] * (1 + tolerance):
+            regressions.append(f"{result['case']} on {result['corpus']}: {before['wall_seconds_min']}s -> {result['wall_seconds_min']}s")
+        if result["tokenizer_calls"] > before["tokenizer_calls"]:
+            regressions.append(f"{result['case']} on {result['corpus']}: {before['tokenizer_calls']} -> {result['tokenizer_calls']} tokenizer calls")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Synthetic markdown sizes, e.g. 10KB,1MB,50MB. Empty for none.")
+    parser.add_argument("--corpus", action="append", default=[], help="Real markdown / docling json file or folder, repeatable.")
+    parser.add_argument("--tokenizer", default=None, help="Local tokenizer path, the summarizer one by default.")
+    parser.add_argument("--cases", default=None, help="Comma separated case names, all by default.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Write the results as json, e.g. to refresh a baseline.")
+    parser.add_argument("--baseline", default=None, help="Json results to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed wall time increase over the baseline.")
+    args = parser.parse_args()
+
+    if args.tokenizer:
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer, local_files_only=True)
+    else:
+        tokenizer = ModelsConfig.SUMMARIZER.tokenizer
+    max_input_tokens = ModelsConfig.SUMMARIZER.max_tokens_input_length
+
+    all_cases = cases(max_input_tokens)
+    selected  = [name.strip() for name in args.cases.split(",")] if args.cases else list(all_cases)
+    sizes     = [size for size in args.sizes.split(",") if size.strip()]
+    corpora   = load_corpora(sizes, args.corpus)
+
+    results = []
+    print(f"{'corpus':<24} {'MB':>6} {'case':<32} {'min s':>8} {'median s':>9} {'tok calls':>10} {'peak MB':>8}")
+    for corpus_name, markdown, docling in corpora:
+        for case_name in selected:
+            # Markdown cases need markdown, the structure chunker needs the docling document.
+            if (docling is None) if case_name == "structure_chunks" else (markdown is None):
+                continue
+            result = {
+                "corpus":   corpus_name,
+                "case":     case_name,
+                "chars":    len(markdown) if markdown is not None else None,
+                **measure(all_cases[case_name], markdown, docling, tokenizer, args.repeats),
+            }
+            results.append(result)
+            size_mb = f"{len(markdown) / 1024 ** 2:.2f}" if markdown is not None else "-"
+            print(f"{corpus_name:<24} {size_mb:>6} {case_name:<32} {result['wall_seconds_min']:>8} {result['wall_seconds_median']:>9} "
+                  f"{result['tokenizer_calls']:>10} {result['peak_python_mb']:>8}")
+
+    report = {
+        "host":      {"platform": platform.platform(), "python": platform.python_version(), "processor": platform.processor()},
+        "tokenizer": getattr(tokenizer, "name_or_path", type(tokenizer).__name__),
+        "repeats":   args.repeats,
+        "results":   results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fp:
+            json.dump(report, fp, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fp:
+            regressions = compare(results, json.load(fp), args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Compare the summarizer loaded in fp32, bf16 and int8 on a fixed corpus: generated tokens per second and
+similarity of the summaries against the fp32 ones (exact match and ROUGE-L F1 on tokens).
+
+    POCKET_GITHUB_PATH=... python lab/model_precision/benchmark_precision.py [--corpus file.txt] [--precisions fp32,int8] [--profile quality]
+
+The corpus file holds one document per paragraph (blank line separated). Models must be downloaded already.
+"""
+import argparse
+import dataclasses
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2] / "service" / "python" / "reasoning-engine"))
+
+import torch
+
+from src.config.models_config import GenerationProfile, ModelsConfig, Precision
+
+# Fixed default corpus, so runs on different hosts are comparable.
+DEFAULT_CORPUS = [
+    "The committee met on Tuesday to review the annual budget. After a long discussion about rising maintenance "
+    "costs for the northern facilities, members agreed to postpone the purchase of new equipment until the second "
+    "quarter. The treasurer presented three scenarios for revenue growth, and the board approved the most "
+    "conservative one. A follow up meeting was scheduled to evaluate the impact of the new energy contracts.",
+    "Researchers analysed ten years of satellite images to measure the retreat of mountain glaciers. They found that "
+    "the rate of ice loss doubled in the last five years compared with the previous decade. Lower snowfall in winter "
+    "and longer summers were the main drivers. The team warns that water supply for several valleys downstream "
+    "depends on meltwater and recommends new reservoirs and stricter irrigation rules.",
+    "The lease agreement is entered into between the landlord and the tenant for a period of three years starting on "
+    "the first day of March. The monthly rent is payable in advance before the fifth day of each month. The tenant "
+    "shall keep the premises in good condition and may not sublet without written consent. Either party may "
+    "terminate the agreement with three months notice after the first year.",
+    "The new release of the application improves startup time by loading plugins lazily and caching the search "
+    "index between sessions. Users reported crashes when opening large folders, which were traced to an unbounded "
+    "queue in the file watcher. The queue is now bounded and the watcher applies backpressure. Documentation was "
+    "updated with a migration guide for custom plugins.",
+]
+
+
+def load_corpus(path):
+    if path is None:
+        return DEFAULT_CORPUS
+    paragraphs = Path(path).read_text(encoding="utf-8").split("\n\n")
+    return [paragraph.strip() for paragraph in paragraphs if paragraph.strip()]
+
+
+def rouge_l_f1(reference, candidate):
+    reference, candidate = reference.split(), candidate.split()
+    if not reference or not candidate:
+        return float(reference == candidate)
+    previous = [0] * (len(candidate) + 1)
+    for ref_token in reference:
+        current = [0]
+        for j, cand_token in enumerate(candidate):
+            current.append(previous[j] + 1 if ref_token == cand_token else max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    if lcs == 0:
+        return 0.0
+    precision, recall = lcs / len(candidate), lcs / len(reference)
+    return 2 * precision * recall / (precision + recall)
+
+
+def run(precision, corpus, batch_size, repeats, profile):
+    model_config = dataclasses.replace(ModelsConfig.SUMMARIZER, precision=precision)
+    load_start = time.time()
+    model, tokenizer, device = model_config.model, model_config.tokenizer, model_config.device
+    load_time = time.time() - load_start
+
+    generation = model_config.generation_kwargs(profile)
+    summaries, generated_tokens, generate_time = [], 0, 0.0
+    for repeat in range(repeats):
+        summaries = []
+        for start in range(0, len(corpus), batch_size):
+            inputs = tokenizer(
+                corpus[start:start + batch_size],
+                max_length=model_config.max_tokens_input_length,
+                truncation=True,
+                padding=True,
+                return_tensors="pt"
+            ).to(device)
+            generate_start = time.time()
+            with torch.inference_mode():
+                outputs = model.generate(**inputs, **generation)
+            generate_time += time.time() - generate_start
+            generated_tokens += int((outputs != tokenizer.pad_token_id).sum())
+            summaries += tokenizer.batch_decode(outputs, skip_special_tokens=True, clean_up_tokenization_spaces=True)
+
+    return {
+        "precision":        precision,
+        "profile":          profile,
+        "device":           str(device),
+        "load_seconds":     round(load_time, 2),
+        "generate_seconds": round(generate_time, 2),
+        "tokens_per_sec":   round(generated_tokens / generate_time, 1) if generate_time else None,
+        "summaries":        [summary.strip() for summary in summaries],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=None, help="Text file, one document per blank line separated paragraph.")
+    parser.add_argument("--precisions", default=",".join(Precision.ALL))
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--profile", default=GenerationProfile.QUALITY, choices=GenerationProfile.ALL, help="Generate settings, as the service uses them.")
+    parser.add_argument("--output", default=None, help="Write the full results, summaries included, as json.")
+    args = parser.parse_args()
+
+    corpus     = load_corpus(args.corpus)
+    precisions = [p.strip() for p in args.precisions.split(",") if p.strip()]
+    if Precision.FP32 not in precisions:
+        precisions.insert(0, Precision.FP32)  # the reference
+
+    results = {precision: run(precision, corpus, args.batch_size, args.repeats, args.profile) for precision in precisions}
+    reference = results[Precision.FP32]["summaries"]
+    for result in results.values():
+        pairs = list(zip(reference, result["summaries"]))
+        result["exact_match"] = round(sum(a == b for a, b in pairs) / len(pairs), 3)
+        result["rouge_l_f1"]  = round(sum(rouge_l_f1(a, b) for a, b in pairs) / len(pairs), 3)
+        result["speedup"]     = round(result["tokens_per_sec"] / results[Precision.FP32]["tokens_per_sec"], 2)
+
+    print(f"{'precision':<10} {'device':<7} {'load s':>7} {'tok/s':>8} {'speedup':>8} {'exact':>6} {'rougeL':>7}")
+    for result in results.values():
+        print(f"{result['precision']:<10} {result['device']:<7} {result['load_seconds']:>7} {result['tokens_per_sec']:>8} "
+              f"{result['speedup']:>8} {result['exact_match']:>6} {result['rouge_l_f1']:>7}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fp:
+            json.dump({"corpus_size": len(corpus), "results": list(results.values())}, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+
+from src.config.models_config import GenerationProfile
+
+
+def _generation_profile(name: str) -> str:
+    """A forced generation profile is validated at load, a typo would only fail once a task picks it."""
+    profile = name.strip().lower()
+    if profile and profile not in GenerationProfile.ALL:
+        raise ValueError(f"Unknown POCKET_GENERATION_PROFILE '{name}', expected one of {GenerationProfile.ALL} or empty")
+    return profile
+
+
+class AnalysisConfig:
+    # Skip hyper_nodes whose file did not change since their last analysis, and only re-run changed stages.
+    INCREMENTAL = os.getenv("POCKET_INCREMENTAL_ANALYSIS", "1") == "1"
+    # Also hash a few sampled blocks of the file, catching edits that keep inode, size and mtime.
+    FINGERPRINT_SAMPLED_HASH = os.getenv("POCKET_FINGERPRINT_SAMPLED_HASH", "0") == "1"
+
+    # Pdfs with more pages than this are converted and summarized as a stream of page windows,
+    # bounding peak memory instead of holding the whole converted document.
+    STREAMING_MIN_PAGES    = int(os.getenv("POCKET_STREAMING_MIN_PAGES", "200"))
+    STREAMING_WINDOW_PAGES = int(os.getenv("POCKET_STREAMING_WINDOW_PAGES", "20"))
+    # Converted windows waiting for the summarizer, the conversion pauses once the queue is full.
+    STREAMING_QUEUE_WINDOWS = int(os.getenv("POCKET_STREAMING_QUEUE_WINDOWS", "2"))
+
+    # Pdfs with more pages than this (and up to STREAMING_MIN_PAGES) are converted as page range shards
+    # in parallel on the conversion pool, cutting the latency of a single big document.
+    SHARDING_MIN_PAGES = int(os.getenv("POCKET_SHARDING_MIN_PAGES", "40"))
+
+    # Chunk summaries are reduced as a tree: groups of up to REDUCE_FAN_IN summaries that fit the model
+    # window are summarized together, level after level, until a single summary fits the window.
+    REDUCE_FAN_IN    = int(os.getenv("POCKET_REDUCE_FAN_IN", "8"))
+    # Past this many levels the remaining summaries are reduced at once, truncated to the model window.
+    REDUCE_MAX_DEPTH = int(os.getenv("POCKET_REDUCE_MAX_DEPTH", "4"))
+
+    # Persistent cache of chunk summaries, keyed by chunk text and generation settings.
+    SUMMARY_CACHE        = os.getenv("POCKET_SUMMARY_CACHE", "1") == "1"
+    SUMMARY_CACHE_MAX_MB = int(os.getenv("POCKET_SUMMARY_CACHE_MAX_MB", "64"))
+
+    # Size bound of the content addressed store of docling conversions, least recently used entries go first.
+    CONVERSION_CACHE_MAX_MB = int(os.getenv("POCKET_CONVERSION_CACHE_MAX_MB", "2048"))
+
+    # Generation profile of the summaries: "fast", "balanced" or "quality" forces one for every task,
+    # empty picks it per task. Tasks with at least PROFILE_QUALITY_MIN_PRIORITY (interactive requests) get
+    # "quality"; background tasks get "fast" for files from PROFILE_FAST_MIN_MB on, "balanced" otherwise.
+    GENERATION_PROFILE           = _generation_profile(os.getenv("POCKET_GENERATION_PROFILE", ""))
+    PROFILE_QUALITY_MIN_PRIORITY = int(os.getenv("POCKET_PROFILE_QUALITY_MIN_PRIORITY", "1"))
+    PROFILE_FAST_MIN_MB          = int(os.getenv("POCKET_PROFILE_FAST_MIN_MB", "5"))
+
+    # Extractive pre-reduction (TextRank) before the abstractive summarizer. Budgets by document size as
+    # "min_tokens:budget_tokens" tiers: documents from min_tokens on keep their best units up to budget_tokens.
+    # Smaller documents are summarized whole; streamed documents keep the ratio of the largest tier per window.
+    EXTRACTIVE_REDUCTION = os.getenv("POCKET_EXTRACTIVE_REDUCTION", "1") == "1"
+    EXTRACTIVE_BUDGETS   = sorted(
+        tuple(int(value) for value in tier.split(":"))
+        for tier in os.getenv("POCKET_EXTRACTIVE_BUDGETS", "16000:12000,64000:24000,256000:48000").split(",")
+        if tier.strip()
+    )
+
+    # Structure aligned chunks of converted pdfs (sections, lists, tables): up to STRUCTURE_CHUNK_MAX_TOKENS
+    # tokens each, consecutive sections are packed together while the chunk has less than STRUCTURE_CHUNK_MIN_TOKENS.
+    STRUCTURE_CHUNK_MAX_TOKENS = int(os.getenv("POCKET_STRUCTURE_CHUNK_MAX_TOKENS", "512"))
+    STRUCTURE_CHUNK_MIN_TOKENS = int(os.getenv("POCKET_STRUCTURE_CHUNK_MIN_TOKENS", "128"))
+
+    # Save the tokenization of the converted markdown next to it in the conversion cache, so re-analyzing
+    # the document (e.g. with other chunk or generation settings) does not tokenize it again.
+    PERSIST_TOKENS = os.getenv("POCKET_PERSIST_TOKENS", "1") == "1"
+
+    # Per document analysis deadline: base seconds plus seconds per MB of file, counted from the start of its
+    # summarization. Past it the summarization stops at the next chunk and the task fails.
+    DOCUMENT_TIMEOUT_SECONDS        = int(os.getenv("POCKET_DOCUMENT_TIMEOUT_SECONDS", "1800"))
+    DOCUMENT_TIMEOUT_SECONDS_PER_MB = int(os.getenv("POCKET_DOCUMENT_TIMEOUT_SECONDS_PER_MB", "60"))
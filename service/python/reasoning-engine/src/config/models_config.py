@@ -31,6 +31,34 @@ logger = get_logger(__name__)
 from .device_config import DeviceConfig
 
 
+class Precision:
+    """Weights precision a ModelConfig model is loaded with."""
+    FP32 = "fp32"
+    BF16 = "bf16"
+    # Dynamic int8 quantization of the Linear layers, CPU only.
+    INT8 = "int8"
+
+    ALL = (FP32, BF16, INT8)
+
+
+class Backend:
+    """Inference runtime of a ModelConfig model."""
+    TORCH = "torch"
+    # ONNX Runtime on cpu, exported once into the models directory.
+    ONNX  = "onnx"
+
+    ALL = (TORCH, ONNX)
+
+
+class GenerationProfile:
+    """Named generate settings layered over a model generation_config, from cheapest to best."""
+    FAST     = "fast"
+    BALANCED = "balanced"
+    QUALITY  = "quality"
+
+    ALL = (FAST, BALANCED, QUALITY)
+
+
 @dataclass
 class ModelConfig:
     name: str
@@ -41,6 +69,10 @@ class ModelConfig:
     device_priority: list[str]      = field(default_factory=lambda: ["mps", "cuda", "cpu"])
     model_params: Dict[str, Any]    = field(default_factory=dict)
     model_class: Optional[Any]      = None
+    precision: str                  = field(default=Precision.FP32)
+    backend: str                    = field(default=Backend.TORCH)
+    # GenerationProfile name -> generate arguments overriding model_params["generation_config"].
+    generation_profiles: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     _model: Optional[Any]           = field(default=None, init=False, repr=False)
     _tokenizer: Optional[Any]       = field(default=None, init=False, repr=False)
     _device: Optional[torch.device] = field(default=None, init=False, repr=False)
@@ -49,6 +81,13 @@ class ModelConfig:
     def __post_init__(self):
         if self.model_params is None:
             self.model_params = {}
+        if self.precision not in Precision.ALL:
+            raise ValueError(f"Unknown precision '{self.precision}' for {self.name}, expected one of {Precision.ALL}")
+        if self.backend not in Backend.ALL:
+            raise ValueError(f"Unknown backend '{self.backend}' for {self.name}, expected one of {Backend.ALL}")
+        if self.backend == Backend.ONNX and self.precision != Precision.FP32:
+            # @todo int8 through the ORT quantizer, per exported graph.
+            raise ValueError(f"The {Backend.ONNX} backend of {self.name} only supports {Precision.FP32}, not {self.precision}")
     
     @property
     def local_path(self, name: string = None) -> Path:
@@ -132,10 +171,38 @@ class ModelConfig:
         else:
             logger.info(f"Model {self.name} already exists at {self.local_path}")
 
+    @property
+    def quantized_path(self) -> Path:
+        """Cached int8 weights next to the full precision ones; packed weights are tied to the torch version."""
+        return self.local_path.parent / f"{self.local_path.name}--{Precision.INT8}" / f"state_dict-torch-{torch.__version__}.pt"
+
+    def generation_kwargs(self, profile: str = GenerationProfile.QUALITY) -> Dict[str, Any]:
+        """Arguments for `generate`: the declared generation_config with the profile overrides on top."""
+        if profile not in GenerationProfile.ALL:
+            raise ValueError(f"Unknown generation profile '{profile}', expected one of {GenerationProfile.ALL}")
+        kwargs = {
+            "max_length": self.max_tokens_output_length,
+            "min_length": self.min_tokens_output_length,
+            **self.model_params.get("generation_config", {}),
+            **self.generation_profiles.get(profile, {}),
+        }
+        return {key: value for key, value in kwargs.items() if value is not None}
+
+    @property
+    def onnx_path(self) -> Path:
+        """ONNX export of the model next to the PyTorch weights."""
+        return self.local_path.parent / f"{self.local_path.name}--{Backend.ONNX}"
+
     @property
     def device(self) -> torch.device:
         if self._device is None:
             self._device = DeviceConfig.get_device(self.device_priority)
+            if self.precision == Precision.INT8 and self._device.type != "cpu":
+                logger.warning(f"{self.name} - {Precision.INT8} quantized models only run on cpu, ignoring {self._device}")
+                self._device = torch.device("cpu")
+            if self.backend == Backend.ONNX and self._device.type != "cpu":
+                logger.warning(f"{self.name} - the {Backend.ONNX} backend runs on cpu, ignoring {self._device}")
+                self._device = torch.device("cpu")
         return self._device
 
     @property
@@ -182,17 +249,27 @@ class ModelConfig:
                     **non_gen_params
                 )
                 
-                # Then initialize the model with this config
+                # Then initialize the model with this config, in the configured precision
                 model_class = self.model_class or AutoModel
-                self._model = model_class.from_pretrained(
-                    str(self.local_path),
-                    config=config,
-                    local_files_only=True,
-                    trust_remote_code=False,
-                    ignore_mismatched_sizes=True
-                ).to(self.device)
+                if self.backend == Backend.ONNX:
+                    self._model = self._load_onnx(model_class)
+                    logger.debug(f"Loaded model {self.name} on {Backend.ONNX} runtime")
+                else:
+                    if self.precision == Precision.INT8:
+                        self._model = self._load_quantized(model_class, config).to(self.device)
+                    else:
+                        self._model = model_class.from_pretrained(
+                            str(self.local_path),
+                            config=config,
+                            local_files_only=True,
+                            trust_remote_code=False,
+                            ignore_mismatched_sizes=True,
+                            torch_dtype=torch.bfloat16 if self.precision == Precision.BF16 else torch.float32
+                        ).to(self.device)
+                    self._model.eval()
+                    logger.debug(f"Loaded model {self.name} in {self.precision} on {self.device}")
                 
-                # Configure generation parameters if they exist
+                # Configure generation parameters if they exist, on both backends
                 if hasattr(self._model, 'generation_config'):
                     for key, value in self.model_params.items():
                         if hasattr(self._model.generation_config, key):
@@ -203,6 +280,79 @@ class ModelConfig:
                 raise
         return self._model
 
+    def _load_onnx(self, model_class):
+        """
+        ONNX Runtime model with the same `generate` / forward interface as the transformers one.
+        Exported once into `onnx_path` (seq2seq models as encoder and decoder graphs with KV cache).
+        """
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import (
+                ORTModelForSeq2SeqLM,
+                ORTModelForCausalLM,
+                ORTModelForSequenceClassification,
+            )
+        except ImportError as e:
+            raise ValueError(f"The {Backend.ONNX} backend of {self.name} needs optimum[onnxruntime]: {str(e)}")
+
+        ort_class = {
+            AutoModelForSeq2SeqLM:              ORTModelForSeq2SeqLM,
+            AutoModelForCausalLM:               ORTModelForCausalLM,
+            AutoModelForSequenceClassification: ORTModelForSequenceClassification,
+        }.get(self.model_class)
+        if ort_class is None:
+            raise ValueError(f"No {Backend.ONNX} model class for {self.name} ({getattr(model_class, '__name__', model_class)})")
+        use_cache = {"use_cache": True} if ort_class in (ORTModelForSeq2SeqLM, ORTModelForCausalLM) else {}
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        onnx_path = self.onnx_path
+        if not onnx_path.exists():
+            logger.info(f"Exporting {self.name} to {Backend.ONNX} at {onnx_path}")
+            temp_path = onnx_path.with_name(f".{onnx_path.name}.tmp")
+            model = ort_class.from_pretrained(str(self.local_path), export=True, local_files_only=True, **use_cache)
+            model.save_pretrained(str(temp_path))
+            self.tokenizer.save_pretrained(str(temp_path))
+            os.replace(temp_path, onnx_path)
+
+        model = ort_class.from_pretrained(
+            str(onnx_path),
+            local_files_only=True,
+            provider="CPUExecutionProvider",
+            session_options=session_options,
+            **use_cache
+        )
+        return model
+
+    def _load_quantized(self, model_class, config):
+        """
+        Dynamic int8 quantization of the Linear layers. The first load quantizes the full precision weights and
+        caches the result at `quantized_path`; later loads build the quantized structure and load the cache.
+        """
+        quantized_path = self.quantized_path
+        if quantized_path.exists():
+            logger.debug(f"Loading {Precision.INT8} weights from {quantized_path}")
+            model = torch.ao.quantization.quantize_dynamic(model_class.from_config(config), {torch.nn.Linear}, dtype=torch.qint8)
+            # Packed quantized weights are not plain tensors; the file is our own artifact.
+            model.load_state_dict(torch.load(quantized_path, map_location="cpu", weights_only=False))
+            return model
+
+        logger.info(f"Quantizing {self.name} to {Precision.INT8}, cached at {quantized_path}")
+        model = model_class.from_pretrained(
+            str(self.local_path),
+            config=config,
+            local_files_only=True,
+            trust_remote_code=False,
+            ignore_mismatched_sizes=True
+        )
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        quantized_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = quantized_path.with_suffix(".tmp")
+        torch.save(model.state_dict(), temp_path)
+        os.replace(temp_path, quantized_path)
+        return model
+
 class ModelsConfig:
     _instance = None
     _is_initialized = False
@@ -437,6 +587,16 @@ class ModelsConfig:
         min_tokens_output_length=56,
         model_class=AutoModelForSeq2SeqLM,
         device_priority=["mps", "cuda", "cpu"],
+        # fp32 | bf16 | int8 (cpu only), see lab/model_precision to compare them.
+        precision=os.getenv("POCKET_SUMMARIZER_PRECISION", Precision.FP32),
+        # torch | onnx (cpu, fp32 only)
+        backend=os.getenv("POCKET_SUMMARIZER_BACKEND", Backend.TORCH),
+        # Quality keeps the declared beam search; bulk indexing can trade some of it for throughput.
+        generation_profiles={
+            GenerationProfile.FAST:     {"num_beams": 1, "early_stopping": False, "length_penalty": 1.0},
+            GenerationProfile.BALANCED: {"num_beams": 2},
+            GenerationProfile.QUALITY:  {},
+        },
         model_params={
             # Only model-specific parameters here
             "decoder_start_token_id": 2,
@@ -455,3 +615,11 @@ class ModelsConfig:
         }
     )
 
+    # Text embeddings, loaded through sentence-transformers by TextEmbeddings.
+    EMBEDDINGS = ModelConfig(
+        name="sentence-transformers/all-MiniLM-L6-v2",
+        max_tokens_input_length=256,
+        device_priority=["mps", "cuda", "cpu"],
+        # torch | onnx
+        backend=os.getenv("POCKET_EMBEDDINGS_BACKEND", Backend.TORCH),
+    )
@@ -0,0 +1,26 @@
+import os
+
+
+class WorkersConfig:
+    # Async workers consume the in-memory job queue on the FastAPI event loop. Each one keeps a document
+    # in flight, so it should be at least the number of analysis pipeline stages for the stages to overlap.
+    NUM_ASYNC_WORKERS   = int(os.getenv("POCKET_NUM_ASYNC_WORKERS", "8"))
+    # Process workers run CPU bound steps (pdf parsing, conversion) outside the GIL.
+    NUM_PROCESS_WORKERS = int(os.getenv("POCKET_NUM_PROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+    # Kept small on purpose: tasks are leased right before being queued, so a long queue means stale leases.
+    QUEUE_MAX_SIZE      = int(os.getenv("POCKET_WORKERS_QUEUE_MAX_SIZE", "64"))
+    # Finished jobs are kept in memory so their status can still be queried for a while.
+    MAX_FINISHED_JOBS   = int(os.getenv("POCKET_WORKERS_MAX_FINISHED_JOBS", "100"))
+
+    # Task leasing from the SQLite task table.
+    LEASE_BATCH_SIZE    = int(os.getenv("POCKET_TASK_LEASE_BATCH_SIZE", "16"))
+    LEASE_SECONDS       = int(os.getenv("POCKET_TASK_LEASE_SECONDS", "600"))
+
+    # Docling conversion processes, each one keeps a warm DocumentConverter.
+    NUM_CONVERSION_WORKERS = int(os.getenv("POCKET_NUM_CONVERSION_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+    # Staged analysis pipeline: bounded queues between stages, per stage executors.
+    PIPELINE_QUEUE_SIZE      = int(os.getenv("POCKET_PIPELINE_QUEUE_SIZE", "4"))
+    PIPELINE_CONVERT_WORKERS = int(os.getenv("POCKET_PIPELINE_CONVERT_WORKERS", str(NUM_CONVERSION_WORKERS)))
+    # Summarize consumers for large pdfs, which are summarized while the conversion pool streams their pages.
+    PIPELINE_STREAM_LANES    = int(os.getenv("POCKET_PIPELINE_STREAM_LANES", "1"))
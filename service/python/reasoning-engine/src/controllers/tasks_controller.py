@@ -1,40 +1,151 @@
+import asyncio
+from typing import AsyncIterator
+
 from fastapi import HTTPException
 
-from src.domain.on_metal.logger         import get_logger
-from src.domain.on_metal.tasks.Analyzer import Analyzer
-from src.service.database.sqlite.models.task import Task
-from src.service.database.sqlite.models.hnode import HNode
+from src.config.analysis_config                  import AnalysisConfig
+from src.config.workers_config                   import WorkersConfig
+from src.domain.on_metal.logger                  import get_logger
+from src.domain.on_metal.tasks.Analyzer          import Analyzer
+from src.domain.on_metal.tasks.worker_pool       import WorkerPool, Job
+from src.domain.on_metal.tasks.analysis_pipeline import AnalysisPipeline
+from src.domain.on_metal.tasks.analysis_events   import AnalysisEvent, AnalysisEvents
+from src.service.database.sqlite.task_queue      import TaskQueue, LeasedTask
+from src.service.database.sqlite.models.hnode    import HNode
 
 logger = get_logger(__name__)
 
+ANALYZE_NEW_TASK_NAME = "Analyze-new"
+
 class TasksController:
-    @staticmethod
-    async def consume_tasks_table():
+    def __init__(self, worker_pool: WorkerPool, pipeline: AnalysisPipeline = None):
+        self.worker_pool = worker_pool
+        self.pipeline    = pipeline
+        self._feeders    = set()
+
+    async def consume_tasks_table(self):
+        """Start leasing the pending tasks onto the worker pool and return the job id to poll for progress."""
         try:
-            tasks = Task.fetch_all_tasks()
-            logger.debug(f">> TASK: Consuming {len(tasks)} tasks from SQLite table...")
-            for task in tasks:
-                if task.name == "Analyze-new":
-                    hnode = HNode.fetch_by_hyper_node_id(task.hyper_node_id)
-                    if hnode.is_file == 1:
-                        await Analyzer.analyze_file(hnode)
-                    elif hnode.is_folder == 1:
-                        Analyzer.analyze_folder(hnode)
-                    else:
-                        logger.debug("Unknown")
-                        raise HTTPException(status_code=400, detail="Unknown task type")
-
-        except HTTPException as e:
-            logger.error(f"HTTPException occurred: {e.detail}")
-            raise e
+            job = self.worker_pool.create_job(is_feeding=True)
+            # Each job leases with its own worker id so a lease can never be owned twice inside this process.
+            task_queue = TaskQueue(worker_id=f"{TaskQueue.default_worker_id()}:{job.id}")
+            self._feeders.add(asyncio.create_task(self._feed_job(job, task_queue)))
+
         except Exception as e:
             logger.error(f"An unexpected error occurred: {str(e)}")
-            raise HTTPException(status_code=500, detail="An unexpected error occurred while processing tasks.")
-        
-        logger.debug(f">> Processed {len(tasks)} tasks done.")
+            raise HTTPException(status_code=500, detail="An unexpected error occurred while queueing tasks.")
 
         response = {
-            "result": f"All tasks Done. Number of tasks performed: {len(tasks)}"
+            "result": "Tasks are being queued.",
+            "job_id": job.id,
         }
-        
+
         return response
+
+    async def _feed_job(self, job: Job, task_queue: TaskQueue):
+        """Lease small batches of tasks as the worker queue drains, so leases are claimed right before processing."""
+        try:
+            while True:
+                tasks = await asyncio.to_thread(task_queue.lease, limit=WorkersConfig.LEASE_BATCH_SIZE, name=ANALYZE_NEW_TASK_NAME)
+                if not tasks:
+                    break
+                await self.worker_pool.submit(tasks, job=job)
+        except Exception as e:
+            logger.error(f"Failed leasing tasks for job {job.id}: {str(e)}", exc_info=True)
+        finally:
+            job.is_feeding = False
+            self._feeders.discard(asyncio.current_task())
+        logger.debug(f">> Job {job.id}: {len(job.tasks)} tasks leased.")
+
+    def get_job_status(self, job_id: str):
+        job = self.worker_pool.get_job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+        return job.to_dict()
+
+    async def stream_analysis(self, hyper_node_id: str, priority: int = AnalysisConfig.PROFILE_QUALITY_MIN_PRIORITY) -> AsyncIterator[str]:
+        """
+        Analyze a hyper_node now and yield its partial results as Server-Sent Events: metadata, every chunk summary,
+        the final summary, then `done` (or `error`). A client disconnecting cancels the analysis.
+        """
+        hnode = await asyncio.to_thread(HNode.fetch_by_hyper_node_id, hyper_node_id)
+        if hnode is None:
+            raise HTTPException(status_code=404, detail=f"hyper_node '{hyper_node_id}' not found.")
+        if hnode.is_file != 1:
+            raise HTTPException(status_code=400, detail=f"hyper_node '{hyper_node_id}' is not a file.")
+
+        events = AnalysisEvents()
+
+        async def analyze():
+            try:
+                await Analyzer.analyze_file(hnode, pipeline=self.pipeline, priority=priority, events=events, with_chunks=True)
+                events.emit(AnalysisEvent.DONE, {"hyper_node_id": hyper_node_id})
+            except Exception as e:
+                logger.error(f"Streamed analysis of {hyper_node_id} failed: {str(e)}", exc_info=True)
+                events.emit(AnalysisEvent.ERROR, {"hyper_node_id": hyper_node_id, "detail": str(e)})
+            finally:
+                events.close()
+
+        async def event_stream() -> AsyncIterator[str]:
+            analysis = asyncio.create_task(analyze())
+            try:
+                async for event, data in events:
+                    yield AnalysisEvents.to_sse(event, data)
+            finally:
+                analysis.cancel()
+
+        return event_stream()
+
+    async def perform_task(self, task: LeasedTask):
+        """Worker pool handler: analyze the hyper_node a single leased task refers to."""
+        task_queue = TaskQueue(worker_id=task.leased_by)
+        if not await asyncio.to_thread(task_queue.renew, task.id):
+            raise RuntimeError(f"Lease lost for task {task.id}, skipping it.")
+
+        # The analysis runs as its own task so a lost lease (task revoked or reclaimed) can cancel it.
+        analysis   = asyncio.create_task(self._analyze(task))
+        lease_lost = asyncio.Event()
+        heartbeat  = asyncio.create_task(self._keep_lease(task_queue, task.id, analysis, lease_lost))
+        try:
+            await analysis
+        except asyncio.CancelledError:
+            if not lease_lost.is_set():
+                analysis.cancel()
+                raise
+            raise RuntimeError(f"Lease lost for task {task.id}, analysis cancelled.")
+        except Exception:
+            await asyncio.to_thread(task_queue.fail, task.id)
+            raise
+        finally:
+            heartbeat.cancel()
+
+        await asyncio.to_thread(task_queue.complete, task.id)
+
+    @staticmethod
+    async def release_task(task: LeasedTask):
+        """Worker pool release hook: a task queued but never started goes back to pending right away."""
+        task_queue = TaskQueue(worker_id=task.leased_by)
+        await asyncio.to_thread(task_queue.release, task.id)
+
+    async def _analyze(self, task: LeasedTask):
+        # Leased tasks come with their hyper_node already loaded in bulk; fall back to a lookup otherwise.
+        hnode = task.hnode or await asyncio.to_thread(HNode.fetch_by_hyper_node_id, task.hyper_node_id)
+        if hnode is None:
+            raise ValueError(f"hyper_node {task.hyper_node_id} not found for task {task.id}")
+        if hnode.is_file == 1:
+            await Analyzer.analyze_file(hnode, pipeline=self.pipeline, priority=task.priority, with_chunks=True)
+        elif hnode.is_folder == 1:
+            Analyzer.analyze_folder(hnode)
+        else:
+            logger.debug("Unknown")
+            raise ValueError(f"Unknown hyper_node type for task {task.id}")
+
+    @staticmethod
+    async def _keep_lease(task_queue: TaskQueue, task_id: int, analysis: asyncio.Task, lease_lost: asyncio.Event):
+        while True:
+            await asyncio.sleep(task_queue.lease_seconds / 3)
+            if not await asyncio.to_thread(task_queue.renew, task_id):
+                logger.warning(f"Lease lost for task {task_id}, cancelling its analysis.")
+                lease_lost.set()
+                analysis.cancel()
+                return
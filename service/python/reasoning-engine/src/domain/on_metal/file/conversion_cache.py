@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib           import contextmanager
+from dataclasses          import asdict
+from importlib.metadata   import PackageNotFoundError, version
+from pathlib              import Path
+from typing               import Any, Dict, List, Optional
+
+from src.config.analysis_config                  import AnalysisConfig
+from src.config.repository_config                import DOCS_REPOSITORY_PATH
+from src.domain.on_metal.file.converter_registry import ConverterOptions
+
+from src.domain.on_metal.logger import get_logger
+logger = get_logger(__name__)
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class ConversionCache:
+    """
+    Content addressed store for docling conversion outputs (md / json / txt / doctags).
+    Entries are keyed by the sha256 of the pdf bytes plus the docling version and the options that change
+    the output, so copies and renames hit the same entry and edited files miss it.
+    A small SQLite index remembers the content hash of each path (by inode / size / mtime) to avoid
+    re-hashing unchanged files on every lookup, and the size of each entry: the store is bounded in size,
+    the least recently used entries are evicted first.
+    """
+    ROOT_PATH   = DOCS_REPOSITORY_PATH / "cas"
+    INDEX_PATH  = DOCS_REPOSITORY_PATH / "cas_index.sqlite"
+    # Exports used to be written as DOCS_REPOSITORY_PATH/<pdf stem>.<extension>; they are moved in on a miss.
+    LEGACY_PATH = DOCS_REPOSITORY_PATH
+    MAX_BYTES   = AnalysisConfig.CONVERSION_CACHE_MAX_MB * 1024 * 1024
+    # Stored file extension by export type.
+    EXTENSIONS = {
+        "json":     "json",
+        "text":     "txt",
+        "markdown": "md",
+        "doctags":  "doctags",
+    }
+
+    _schema_ready = False
+
+    @classmethod
+    def get(cls, pdf_path: str, output_type: str, options: ConverterOptions) -> Optional[Any]:
+        """Return a cached export of the pdf, or None when these bytes were never converted with these options."""
+        entry_dir = cls._entry_dir(cls.cache_key(cls.content_hash(pdf_path), options))
+        file_path = entry_dir / f"document.{cls.EXTENSIONS[output_type]}"
+        if not file_path.exists():
+            cls._import_legacy(pdf_path, options)
+        if not file_path.exists():
+            logger.debug(f"ConversionCache - Miss for {pdf_path} ({output_type})")
+            return None
+
+        with cls._connect() as connection:
+            connection.execute("UPDATE conversion SET last_access = ? WHERE cache_key = ?", (time.time(), entry_dir.name))
+        logger.debug(f"ConversionCache - Hit for {pdf_path} ({output_type})")
+        with file_path.open("r", encoding="utf-8") as fp:
+            return json.load(fp) if output_type == "json" else fp.read()
+
+    @classmethod
+    def put(cls, pdf_path: str, exports: Dict[str, Any], options: ConverterOptions) -> Path:
+        content_hash = cls.content_hash(pdf_path)
+        cache_key    = cls.cache_key(content_hash, options)
+        entry_dir    = cls._entry_dir(cache_key)
+        entry_dir.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write next to the final location and swap it in, readers never see a half written entry.
+        staging_dir = Path(tempfile.mkdtemp(dir=entry_dir.parent, prefix=f".{cache_key}-"))
+        try:
+            for output_type, content in exports.items():
+                with (staging_dir / f"document.{cls.EXTENSIONS[output_type]}").open("w", encoding="utf-8") as fp:
+                    fp.write(json.dumps(content) if output_type == "json" else content)
+            cls._swap_in(staging_dir, entry_dir)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        cls._index_entry(cache_key, content_hash, options)
+        logger.debug(f"ConversionCache - Stored {sorted(exports)} for {pdf_path} as {cache_key}")
+        return entry_dir
+
+    @staticmethod
+    def _swap_in(staging_dir: Path, entry_dir: Path):
+        """
+        Replace `entry_dir` by `staging_dir` with renames only: the old entry is moved aside (a directory cannot be
+        renamed over a non empty one), the new one takes its place and the old one is deleted afterwards.
+        A concurrent put of the same key stored the same content, so losing the race to it is a successful put.
+        """
+        retired_dir = entry_dir.with_name(f".{entry_dir.name}-retired-{os.getpid()}-{time.monotonic_ns()}")
+        try:
+            os.replace(entry_dir, retired_dir)
+        except FileNotFoundError:
+            retired_dir = None
+        try:
+            os.replace(staging_dir, entry_dir)
+        except OSError:
+            if not entry_dir.exists():
+                raise
+            logger.debug(f"ConversionCache - {entry_dir.name} was stored concurrently, keeping that entry")
+        finally:
+            if retired_dir is not None:
+                shutil.rmtree(retired_dir, ignore_errors=True)
+
+    @classmethod
+    def put_file(cls, pdf_path: str, output_type: str, source_path: Path, options: ConverterOptions) -> Path:
+        """Move an export already written to disk (e.g. streamed markdown) into the cache entry of the pdf."""
+        content_hash = cls.content_hash(pdf_path)
+        cache_key    = cls.cache_key(content_hash, options)
+        entry_dir    = cls._entry_dir(cache_key)
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        os.replace(source_path, entry_dir / f"document.{cls.EXTENSIONS[output_type]}")
+
+        cls._index_entry(cache_key, content_hash, options)
+        logger.debug(f"ConversionCache - Stored streamed {output_type} for {pdf_path} as {cache_key}")
+        return entry_dir
+
+    @classmethod
+    def _import_legacy(cls, pdf_path: str, options: ConverterOptions):
+        """
+        Move the exports the pdf had under the old stem based layout into its entry, once. Exports older than the
+        pdf were converted from other bytes, they are deleted instead.
+        """
+        stem         = Path(pdf_path).stem
+        pdf_mtime_ns = os.stat(pdf_path).st_mtime_ns
+        content_hash = cls.content_hash(pdf_path)
+        cache_key    = cls.cache_key(content_hash, options)
+        entry_dir    = cls._entry_dir(cache_key)
+        imported     = []
+        for extension in cls.EXTENSIONS.values():
+            legacy_path = cls.LEGACY_PATH / f"{stem}.{extension}"
+            try:
+                is_stale = legacy_path.stat().st_mtime_ns < pdf_mtime_ns
+            except FileNotFoundError:
+                continue
+            target = entry_dir / f"document.{extension}"
+            if is_stale or target.exists():
+                legacy_path.unlink(missing_ok=True)
+                continue
+            entry_dir.mkdir(parents=True, exist_ok=True)
+            os.replace(legacy_path, target)
+            imported.append(extension)
+
+        if imported:
+            cls._index_entry(cache_key, content_hash, options)
+            logger.info(f"ConversionCache - Imported legacy {imported} exports of {pdf_path} as {cache_key}")
+
+    @classmethod
+    def entry_file(cls, pdf_path: str, file_name: str, options: ConverterOptions) -> Path:
+        """Path of a file stored along the exports of the pdf (e.g. derived data), whether it exists or not."""
+        return cls._entry_dir(cls.cache_key(cls.content_hash(pdf_path), options)) / file_name
+
+    @classmethod
+    def _index_entry(cls, cache_key: str, content_hash: str, options: ConverterOptions):
+        now  = time.time()
+        size = sum(path.stat().st_size for path in cls._entry_dir(cache_key).iterdir() if path.is_file())
+        with cls._connect() as connection:
+            connection.execute(
+                """
+                INSERT INTO conversion (cache_key, content_hash, converter_version, options, created_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET last_access = excluded.last_access, size = excluded.size
+                """,
+                (cache_key, content_hash, cls.converter_version(), cls._options_key(options), now, now, size)
+            )
+            evicted = cls._evict(connection, keep=cache_key)
+        # Entries leave the index first, so a concurrent lookup misses rather than reading a half deleted entry.
+        for evicted_key in evicted:
+            shutil.rmtree(cls._entry_dir(evicted_key), ignore_errors=True)
+
+    @classmethod
+    def _evict(cls, connection: sqlite3.Connection, keep: str) -> List[str]:
+        """Drop the least recently used entries, never `keep`, once the stored entries exceed MAX_BYTES."""
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM conversion").fetchone()[0]
+        if total <= cls.MAX_BYTES:
+            return []
+        evicted = [row[0] for row in connection.execute(
+            """
+            SELECT cache_key FROM (
+                SELECT cache_key, SUM(size) OVER (ORDER BY cache_key = ? DESC, last_access DESC, cache_key) AS kept
+                FROM conversion
+            ) WHERE kept > ? AND cache_key != ?
+            """,
+            (keep, cls.MAX_BYTES, keep)
+        ).fetchall()]
+        connection.executemany("DELETE FROM conversion WHERE cache_key = ?", [(cache_key,) for cache_key in evicted])
+        logger.debug(f"ConversionCache - Evicted {len(evicted)} entries ({total:,} bytes over {cls.MAX_BYTES:,})")
+        return evicted
+
+    @classmethod
+    def content_hash(cls, pdf_path: str) -> str:
+        """sha256 of the file bytes, reusing the indexed hash while inode, size and mtime are unchanged."""
+        path = os.path.abspath(str(pdf_path))
+        stat = os.stat(path)
+        with cls._connect() as connection:
+            row = connection.execute(
+                "SELECT content_hash FROM file_fingerprint WHERE path = ? AND inode = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+            if row is not None:
+                return row[0]
+
+            digest = hashlib.sha256()
+            with open(path, "rb") as fp:
+                for block in iter(lambda: fp.read(_HASH_BLOCK_SIZE), b""):
+                    digest.update(block)
+            content_hash = digest.hexdigest()
+
+            connection.execute(
+                "INSERT OR REPLACE INTO file_fingerprint (path, inode, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_ino, stat.st_size, stat.st_mtime_ns, content_hash)
+            )
+            return content_hash
+
+    @classmethod
+    def cache_key(cls, content_hash: str, options: ConverterOptions) -> str:
+        key = f"{content_hash}|docling={cls.converter_version()}|{cls._options_key(options)}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def converter_version() -> str:
+        try:
+            return version("docling")
+        except PackageNotFoundError:
+            return "unknown"
+
+    @staticmethod
+    def _options_key(options: ConverterOptions) -> str:
+        # Threads, device and artifacts location change how fast the output is produced, not the output itself.
+        output_options = {
+            name: value for name, value in asdict(options).items()
+            if name not in ("num_threads", "device", "artifacts_path")
+        }
+        return json.dumps(output_options, sort_keys=True)
+
+    @classmethod
+    def _entry_dir(cls, cache_key: str) -> Path:
+        return cls.ROOT_PATH / cache_key[:2] / cache_key
+
+    @classmethod
+    @contextmanager
+    def _connect(cls):
+        """Short lived connection committed and closed on exit, safe to use from threads and processes."""
+        cls.INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(cls.INDEX_PATH, timeout=30)
+        if not cls._schema_ready:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS file_fingerprint (
+                    path         TEXT PRIMARY KEY,
+                    inode        INTEGER NOT NULL,
+                    size         INTEGER NOT NULL,
+                    mtime_ns     INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_file_fingerprint_hash ON file_fingerprint(content_hash);
+                CREATE TABLE IF NOT EXISTS conversion (
+                    cache_key         TEXT PRIMARY KEY,
+                    content_hash      TEXT NOT NULL,
+                    converter_version TEXT NOT NULL,
+                    options           TEXT NOT NULL,
+                    created_at        REAL NOT NULL,
+                    last_access       REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_conversion_hash ON conversion(content_hash);
+                """
+            )
+            # Indexes created before entries had a size count as empty until they are stored again.
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(conversion)")}
+            if "size" not in columns:
+                connection.execute("ALTER TABLE conversion ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_conversion_last_access ON conversion(last_access)")
+            cls._schema_ready = True
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
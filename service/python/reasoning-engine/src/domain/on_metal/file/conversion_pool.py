@@ -0,0 +1,125 @@
+import asyncio
+import math
+import os
+import time
+from collections        import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing             import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from src.config.workers_config                  import WorkersConfig
+from src.domain.on_metal.file.pdf                import PdfFile
+from src.domain.on_metal.file.converter_registry import ConverterRegistry
+from src.domain.on_metal.file.shard_stitcher     import DoclingJsonStitcher, MarkdownShardStitcher
+
+from src.domain.on_metal.logger import get_logger
+logger = get_logger(__name__)
+
+# One warm DocumentConverter per worker process, built by the pool initializer and reused for every file.
+_worker_converter = None
+
+
+def _init_worker(num_threads: int):
+    global _worker_converter
+    start_time = time.time()
+    _worker_converter = ConverterRegistry.get(PdfFile.converter_options(num_threads=num_threads))
+    logger.debug(f"ConversionPool - Worker {os.getpid()} converter ready in {time.time() - start_time:.2f}s")
+
+
+def _convert_in_worker(pdf_path: str, output_types: Sequence[str], page_range: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+    start_time  = time.time()
+    if page_range is None:
+        conv_result = _worker_converter.convert(os.path.abspath(pdf_path))
+    else:
+        conv_result = _worker_converter.convert(os.path.abspath(pdf_path), page_range=page_range)
+    exports     = {output_type: PdfFile.export(conv_result.document, output_type) for output_type in output_types}
+    logger.debug(f"ConversionPool - Worker {os.getpid()} converted {pdf_path} pages {page_range or 'all'} in {time.time() - start_time:.2f}s")
+    return exports
+
+
+class ConversionPool:
+    """Docling pdf conversion on a pool of processes, each holding its own warm converter."""
+    def __init__(self, num_workers: int = WorkersConfig.NUM_CONVERSION_WORKERS):
+        self.num_workers = max(1, num_workers)
+        # Split the cores between workers instead of letting every worker spin up cpu_count threads.
+        self.num_threads = max(1, (os.cpu_count() or 1) // self.num_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        if self.is_running:
+            return
+        logger.info(f"> Starting conversion pool: {self.num_workers} processes, {self.num_threads} threads each.")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            initializer=_init_worker,
+            initargs=(self.num_threads,)
+        )
+
+    def stop(self):
+        if not self.is_running:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    async def convert(self, pdf_path: str, output_types: Sequence[str] = ("markdown",)) -> Dict[str, Any]:
+        """Convert a pdf and return its exports by output type (markdown / text / doctags as str, json as dict)."""
+        if not self.is_running:
+            raise RuntimeError("Conversion pool is not running.")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _convert_in_worker, str(pdf_path), tuple(output_types))
+
+    async def stream_markdown(self, pdf_path: str, window_pages: int = 20) -> AsyncIterator[str]:
+        """
+        Markdown of the pdf `window_pages` pages at a time, in page order. Windows are converted by the workers,
+        at most one per worker ahead of the consumer, so memory stays bounded however many pages there are.
+        """
+        if not self.is_running:
+            raise RuntimeError("Conversion pool is not running.")
+        loop      = asyncio.get_running_loop()
+        num_pages = await loop.run_in_executor(None, PdfFile.count_pages, str(pdf_path))
+        logger.info(f"> Streaming PDF file to MD: {pdf_path} ({num_pages} pages, {window_pages} pages per window)")
+
+        pending = deque()
+        try:
+            for first_page in range(1, num_pages + 1, window_pages):
+                page_range = (first_page, min(num_pages, first_page + window_pages - 1))
+                pending.append(loop.run_in_executor(self._executor, _convert_in_worker, str(pdf_path), ("markdown",), page_range))
+                if len(pending) >= self.num_workers:
+                    yield (await pending.popleft())["markdown"]
+            while pending:
+                yield (await pending.popleft())["markdown"]
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def convert_sharded(self, pdf_path: str, min_shard_pages: int = 10) -> Dict[str, Any]:
+        """
+        Convert a single large pdf as page range shards spread over all the workers, then stitch them back
+        in page order. The markdown, text and json exports are produced, doctags are not: they are a token
+        sequence per shard that does not join.
+        """
+        if not self.is_running:
+            raise RuntimeError("Conversion pool is not running.")
+        loop        = asyncio.get_running_loop()
+        num_pages   = await loop.run_in_executor(None, PdfFile.count_pages, str(pdf_path))
+        shard_pages = max(min_shard_pages, math.ceil(num_pages / self.num_workers))
+        page_ranges = [
+            (first_page, min(num_pages, first_page + shard_pages - 1))
+            for first_page in range(1, num_pages + 1, shard_pages)
+        ]
+
+        start_time = time.time()
+        shards = await asyncio.gather(*[
+            loop.run_in_executor(self._executor, _convert_in_worker, str(pdf_path), ("markdown", "text", "json"), page_range)
+            for page_range in page_ranges
+        ])
+        logger.info(f"ConversionPool - Converted {pdf_path} ({num_pages} pages) as {len(page_ranges)} shards in {time.time() - start_time:.2f}s")
+
+        return {
+            "markdown": MarkdownShardStitcher.stitch([shard["markdown"] for shard in shards]),
+            "text":     "\n\n".join(shard["text"].strip("\n") for shard in shards),
+            "json":     DoclingJsonStitcher.stitch([shard["json"] for shard in shards]),
+        }
@@ -1,8 +1,5 @@
-from docling.datamodel.base_models      import InputFormat
-from docling.datamodel.pipeline_options import EasyOcrOptions, PdfPipelineOptions
-from docling.document_converter         import DocumentConverter, PdfFormatOption
-
-from src.config.models_config import ModelConfig
+from src.config.models_config                   import ModelConfig
+from src.domain.on_metal.file.converter_registry import ConverterOptions, ConverterRegistry
 
 from src.domain.on_metal.logger import get_logger
 logger = get_logger(__name__)
@@ -12,16 +9,7 @@ class FileConverter:
     @staticmethod
     def pdf_to(output_type, pdf_path):
         try:
-            doc_converter = DocumentConverter(
-                allowed_formats=[InputFormat.PDF],
-                format_options={
-                    InputFormat.PDF: PdfFormatOption(
-                        pipeline_options=PdfPipelineOptions(
-                            artifacts_path=local_docling_models_path,
-                        )
-                    )
-                }
-            )
+            doc_converter = ConverterRegistry.get(ConverterOptions(artifacts_path=str(local_docling_models_path)))
             docling_doc = doc_converter.convert(pdf_path)
             if output_type == 'json':
                 return docling_doc.document.export_to_dict()
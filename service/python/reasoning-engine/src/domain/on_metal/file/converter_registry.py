@@ -0,0 +1,141 @@
+import gc
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing      import Optional, Tuple
+
+import psutil
+from docling.datamodel.base_models      import InputFormat
+from docling.datamodel.pipeline_options import (
+    AcceleratorDevice,
+    AcceleratorOptions,
+    PdfPipelineOptions,
+)
+from docling.document_converter import DocumentConverter, PdfFormatOption
+
+from src.domain.on_metal.logger import get_logger
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class ConverterOptions:
+    """Hashable description of a docling pdf pipeline. `None` keeps docling's own default."""
+    do_ocr:             bool                      = True
+    do_table_structure: bool                      = True
+    do_cell_matching:   bool                      = True
+    ocr_lang:           Optional[Tuple[str, ...]] = None
+    num_threads:        Optional[int]             = None
+    device:             str                       = AcceleratorDevice.AUTO.value
+    artifacts_path:     Optional[str]             = None
+
+    def build_pipeline_options(self) -> PdfPipelineOptions:
+        pipeline_options = PdfPipelineOptions(artifacts_path=self.artifacts_path)
+        pipeline_options.do_ocr = self.do_ocr
+        pipeline_options.do_table_structure = self.do_table_structure
+        pipeline_options.table_structure_options.do_cell_matching = self.do_cell_matching
+        if self.ocr_lang is not None:
+            pipeline_options.ocr_options.lang = list(self.ocr_lang)
+        if self.num_threads is not None:
+            pipeline_options.accelerator_options = AcceleratorOptions(
+                num_threads=self.num_threads, device=AcceleratorDevice(self.device)
+            )
+        return pipeline_options
+
+
+@dataclass
+class _RegistryEntry:
+    converter: DocumentConverter
+    last_used: float
+
+
+class ConverterRegistry:
+    """
+    Process wide cache of warm DocumentConverters, one per distinct ConverterOptions, so the layout,
+    table structure and ocr models are loaded once instead of once per document.
+    Least recently used converters are evicted when idle for too long, when there are too many of them,
+    or when the available memory runs low; on access and on a timer, so a registry gone quiet is freed too.
+    """
+    MAX_CONVERTERS             = 4
+    MAX_IDLE_SECONDS           = 15 * 60
+    MIN_AVAILABLE_MEMORY_BYTES = 2 * 1024 ** 3
+    EVICT_INTERVAL_SECONDS     = 60
+
+    _converters: "OrderedDict[ConverterOptions, _RegistryEntry]" = OrderedDict()
+    _lock = threading.Lock()
+    _evictor: Optional[threading.Thread] = None
+
+    @classmethod
+    def get(cls, options: ConverterOptions = ConverterOptions()) -> DocumentConverter:
+        with cls._lock:
+            cls._evict(keep=options)
+            entry = cls._converters.get(options)
+            if entry is None:
+                start_time = time.time()
+                converter  = DocumentConverter(
+                    allowed_formats=[InputFormat.PDF],
+                    format_options={
+                        InputFormat.PDF: PdfFormatOption(pipeline_options=options.build_pipeline_options())
+                    }
+                )
+                # Load the pipeline models now rather than on the first convert call.
+                converter.initialize_pipeline(InputFormat.PDF)
+                entry = _RegistryEntry(converter=converter, last_used=time.time())
+                cls._converters[options] = entry
+                logger.info(f"ConverterRegistry - Built converter for {options} in {time.time() - start_time:.2f}s")
+                cls._start_evictor()
+
+            entry.last_used = time.time()
+            cls._converters.move_to_end(options)
+            return entry.converter
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._converters.clear()
+        gc.collect()
+
+    @classmethod
+    def _start_evictor(cls):
+        # Called with the lock held; the thread stops once the registry is empty and starts again with the next build.
+        if cls._evictor is None:
+            cls._evictor = threading.Thread(target=cls._evict_periodically, name="converter-registry-evictor", daemon=True)
+            cls._evictor.start()
+
+    @classmethod
+    def _evict_periodically(cls):
+        while True:
+            time.sleep(cls.EVICT_INTERVAL_SECONDS)
+            with cls._lock:
+                cls._evict()
+                if not cls._converters:
+                    cls._evictor = None
+                    return
+
+    @classmethod
+    def _evict(cls, keep: Optional[ConverterOptions] = None):
+        now     = time.time()
+        evicted = [
+            options for options, entry in cls._converters.items()
+            if options != keep and now - entry.last_used > cls.MAX_IDLE_SECONDS
+        ]
+        for options in evicted:
+            del cls._converters[options]
+
+        def is_under_pressure() -> bool:
+            # Room is made for the converter being requested, if it is not built yet.
+            room     = 0 if keep is None or keep in cls._converters else 1
+            too_many = len(cls._converters) + room > cls.MAX_CONVERTERS
+            return too_many or psutil.virtual_memory().available < cls.MIN_AVAILABLE_MEMORY_BYTES
+
+        # Oldest first, never the converter being requested.
+        while is_under_pressure():
+            candidates = [options for options in cls._converters if options != keep]
+            if not candidates:
+                break
+            del cls._converters[candidates[0]]
+            evicted.append(candidates[0])
+
+        if evicted:
+            gc.collect()
+            logger.info(f"ConverterRegistry - Evicted {len(evicted)} converters.")
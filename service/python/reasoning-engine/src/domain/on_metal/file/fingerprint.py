@@ -0,0 +1,44 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing      import Optional
+
+_SAMPLE_BLOCK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    """Cheap change detection for a file: stat fields plus an optional hash of sampled blocks."""
+    inode:        int
+    size:         int
+    mtime_ns:     int
+    sampled_hash: Optional[str] = None
+
+    @staticmethod
+    def from_path(path: str, with_sampled_hash: bool = False) -> "FileFingerprint":
+        stat = os.stat(path)
+        return FileFingerprint(
+            inode=stat.st_ino,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            sampled_hash=FileFingerprint.sampled_hash(path, stat.st_size) if with_sampled_hash else None,
+        )
+
+    @staticmethod
+    def sampled_hash(path: str, size: int) -> str:
+        """Hash of the first, middle and last blocks of the file, constant cost whatever the file size."""
+        digest = hashlib.blake2b(str(size).encode("utf-8"), digest_size=16)
+        with open(path, "rb") as fp:
+            for offset in sorted({0, max(0, size // 2 - _SAMPLE_BLOCK_SIZE // 2), max(0, size - _SAMPLE_BLOCK_SIZE)}):
+                fp.seek(offset)
+                digest.update(fp.read(_SAMPLE_BLOCK_SIZE))
+        return digest.hexdigest()
+
+    def matches(self, other: Optional["FileFingerprint"]) -> bool:
+        if other is None:
+            return False
+        same_stat = (self.inode, self.size, self.mtime_ns) == (other.inode, other.size, other.mtime_ns)
+        # Sampled hashes are only compared when both sides have one.
+        if self.sampled_hash is None or other.sampled_hash is None:
+            return same_stat
+        return same_stat and self.sampled_hash == other.sampled_hash
@@ -7,16 +7,11 @@ from pathlib     import Path
 from dataclasses import dataclass
 
 import fitz  # PyMuPDF
-from docling.datamodel.base_models import InputFormat
-from docling.datamodel.pipeline_options import (
-    AcceleratorDevice,
-    AcceleratorOptions,
-    PdfPipelineOptions,
-)
-from docling.document_converter import DocumentConverter, PdfFormatOption
+from docling.datamodel.pipeline_options import AcceleratorDevice
 
+from src.domain.on_metal.file.converter_registry import ConverterOptions, ConverterRegistry
+from src.domain.on_metal.file.conversion_cache   import ConversionCache
 from src.domain.on_metal.logger import get_logger
-from src.config.repository_config import DOCS_REPOSITORY_PATH
 
 logger = get_logger(__name__)
 
@@ -32,40 +27,57 @@ class PdfAnalysisResults:
     overlapped_fixed_chunks: List[Dict[str, Any]]
 
 class PdfFile:
+    # Intermediate forms kept in the conversion cache, by output type.
+    EXPORT_EXTENSIONS = ConversionCache.EXTENSIONS
+
+    @staticmethod
+    def converter_options(num_threads: int = 4) -> ConverterOptions:
+        return ConverterOptions(
+            do_ocr=True,
+            do_table_structure=True,
+            do_cell_matching=True,
+            ocr_lang=("es",),
+            num_threads=num_threads,
+            device=AcceleratorDevice.AUTO.value,
+        )
+
+    @staticmethod
+    def export(document, output_type: str):
+        if output_type == "json":
+            return document.export_to_dict()
+        elif output_type == "text":
+            return document.export_to_text()
+        elif output_type == "markdown":
+            return document.export_to_markdown()
+        elif output_type == "doctags":
+            return document.export_to_document_tokens()
+        raise ValueError(f"Unknown output type '{output_type}'.")
+
     @staticmethod
     def transform_to_md(file_path: str, persist: bool =True):
         logger.info(f"> Transforming PDF file to MD: {file_path}")
         try:
             input_doc_path = os.path.abspath(str(file_path))
+            options        = PdfFile.converter_options()
 
-            pipeline_options = PdfPipelineOptions()
-            pipeline_options.do_ocr = True
-            pipeline_options.do_table_structure = True
-            pipeline_options.table_structure_options.do_cell_matching = True
-            pipeline_options.ocr_options.lang = ["es"]
-            pipeline_options.accelerator_options = AcceleratorOptions(
-                num_threads=4, device=AcceleratorDevice.AUTO
-            )
-
-            doc_converter = DocumentConverter(
-                format_options={
-                    InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
-                }
-            )
+            cached_markdown = ConversionCache.get(input_doc_path, "markdown", options)
+            if cached_markdown is not None:
+                return cached_markdown
+
+            doc_converter = ConverterRegistry.get(options)
             start_time = time.time()
             conv_result = doc_converter.convert(input_doc_path)
             end_time = time.time() - start_time
 
             logger.debug(f"Document converted to docling in {end_time:.2f} seconds.")
 
-            output_dir = DOCS_REPOSITORY_PATH
-            output_dir.mkdir(parents=True, exist_ok=True)
-            
-            doc_filename = conv_result.input.file.stem
             markdown_doc = conv_result.document.export_to_markdown()
             if persist:
-                # @todo review what happens with below async
-                PdfAnalyzer._persist_file_intermediate_forms_in_local_repo(conv_result, output_dir, doc_filename)
+                exports = {
+                    output_type: PdfFile.export(conv_result.document, output_type)
+                    for output_type in PdfFile.EXPORT_EXTENSIONS
+                }
+                ConversionCache.put(input_doc_path, exports, options)
 
             return markdown_doc
 
@@ -74,22 +86,9 @@ class PdfFile:
             raise Exception(f"Failed to transform_to_md a PDF: {str(e)}") from e
 
     @staticmethod
-    async def _persist_file_intermediate_forms_in_local_repo(conv_result, output_dir: Path, doc_filename: str) -> str:
-        # Export Deep Search document JSON format
-        with (output_dir / f"{doc_filename}.json").open("w", encoding="utf-8") as fp:
-            fp.write(json.dumps(conv_result.document.export_to_dict()))
-        
-        # Export Text format
-        with (output_dir / f"{doc_filename}.txt").open("w", encoding="utf-8") as fp:
-            fp.write(conv_result.document.export_to_text())
-        
-        # Export Markdown format and generate summary
-        with (output_dir / f"{doc_filename}.md").open("w", encoding="utf-8") as fp:
-            fp.write(conv_result.document.export_to_markdown())
-        
-        # Export Document Tags format
-        with (output_dir / f"{doc_filename}.doctags").open("w", encoding="utf-8") as fp:
-            fp.write(conv_result.document.export_to_document_tokens())
+    def count_pages(pdf_path: str) -> int:
+        with fitz.open(pdf_path) as pdf_doc:
+            return len(pdf_doc)
 
     @staticmethod
     def extract_metadata(pdf_path) -> Dict[str, Any]:
@@ -102,21 +101,13 @@ class PdfFile:
 
     @staticmethod
     def get_md_from_file(pdf_path: str) -> Optional[str]:
+        """Markdown of an already converted pdf, looked up by content so copies / renames hit and edits miss."""
         try:
-            path = Path(pdf_path)
-            doc_filename = path.stem
-            md_path = DOCS_REPOSITORY_PATH / f"{doc_filename}.md"
-            
-            if not md_path.exists():
+            markdown = ConversionCache.get(pdf_path, "markdown", PdfFile.converter_options())
+            if markdown is None:
                 logger.warning(f"Markdown file not found for PDF: {pdf_path}")
-                return None
-                
-            with md_path.open("r", encoding="utf-8") as fp:
-                return fp.read()
-                
+            return markdown
+
         except Exception as e:
             logger.error(f"Error reading markdown file for PDF {pdf_path}: {str(e)}")
             return None
-
-
-
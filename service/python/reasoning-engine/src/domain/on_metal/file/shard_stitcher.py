@@ -0,0 +1,178 @@
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+_TABLE_SEPARATOR_RE = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+_ITEM_REF_RE        = re.compile(r"^#/(\w+)/(\d+)$")
+_SENTENCE_END_CHARS = ('.', '!', '?', ':', ';', '"', "'", ')')
+
+
+class MarkdownShardStitcher:
+    """
+    Joins the markdown of page range shards of the same pdf back into one document, repairing what the
+    shard boundaries broke: tables split in two (the continuation gets a made-up header separator),
+    paragraphs cut mid sentence, and a document title repeated as `#` heading at the start of shards.
+    """
+    @staticmethod
+    def stitch(shards: List[str]) -> str:
+        stitched: List[str] = []
+        for shard in shards:
+            lines = shard.strip("\n").splitlines()
+            if not lines:
+                continue
+            if not stitched:
+                stitched = lines
+                continue
+
+            lines = MarkdownShardStitcher._demote_titles(lines, title=next((line for line in stitched if line.startswith("# ")), None))
+            previous_line = MarkdownShardStitcher._last_non_empty(stitched)
+            first_line    = lines[0]
+
+            if MarkdownShardStitcher._is_table_row(previous_line) and MarkdownShardStitcher._is_table_row(first_line) \
+                    and MarkdownShardStitcher._num_columns(previous_line) == MarkdownShardStitcher._num_columns(first_line):
+                # Continuation of the same table: keep its rows (its "header" is a data row), drop the separator.
+                if len(lines) > 1 and _TABLE_SEPARATOR_RE.match(lines[1].strip()):
+                    lines = [lines[0]] + lines[2:]
+                MarkdownShardStitcher._strip_trailing_empty(stitched)
+                stitched += lines
+            elif MarkdownShardStitcher._is_cut_paragraph(previous_line, first_line):
+                MarkdownShardStitcher._strip_trailing_empty(stitched)
+                stitched[-1] = f"{stitched[-1].rstrip()} {first_line.lstrip()}"
+                stitched += lines[1:]
+            else:
+                stitched += [""] + lines
+
+        return "\n".join(stitched) + "\n" if stitched else ""
+
+    @staticmethod
+    def _demote_titles(lines: List[str], title: Optional[str] = None) -> List[str]:
+        """Demote the repetitions of the document title (its first `#` heading), other `#` headings are kept."""
+        if title is None:
+            return lines
+        return ["#" + line if line.rstrip() == title.rstrip() else line for line in lines]
+
+    @staticmethod
+    def _is_cut_paragraph(previous_line: str, first_line: str) -> bool:
+        previous_line, first_line = previous_line.strip(), first_line.strip()
+        if not previous_line or not first_line:
+            return False
+        if previous_line.startswith(("#", "|", "-", "*", "!", "<")) or first_line.startswith(("#", "|", "-", "*", "!", "<")):
+            return False
+        return not previous_line.endswith(_SENTENCE_END_CHARS) and first_line[0].islower()
+
+    @staticmethod
+    def _is_table_row(line: str) -> bool:
+        line = line.strip()
+        return line.startswith("|") and line.endswith("|")
+
+    @staticmethod
+    def _num_columns(line: str) -> int:
+        return line.strip().strip("|").count("|") + 1
+
+    @staticmethod
+    def _last_non_empty(lines: List[str]) -> str:
+        for line in reversed(lines):
+            if line.strip():
+                return line
+        return ""
+
+    @staticmethod
+    def _strip_trailing_empty(lines: List[str]):
+        while lines and not lines[-1].strip():
+            lines.pop()
+
+
+class DoclingJsonStitcher:
+    """
+    Joins the docling json exports (`export_to_dict`) of page range shards of the same pdf into one document:
+    the item lists (texts, groups, tables, ...) are appended with their `#/<list>/<index>` references renumbered,
+    body and furniture children are concatenated in shard order and the pages are merged. A table continued
+    across a shard boundary is merged into one, as `MarkdownShardStitcher` does.
+    """
+    _ROOTS = ("body", "furniture")
+
+    @staticmethod
+    def stitch(shards: List[Dict[str, Any]]) -> Dict[str, Any]:
+        stitched: Dict[str, Any] = {}
+        for shard in shards:
+            if not stitched:
+                stitched = shard
+                continue
+            offsets = {name: len(stitched.get(name, [])) for name, items in shard.items() if isinstance(items, list)}
+            shard   = DoclingJsonStitcher._renumber(shard, lambda name, index: index + offsets.get(name, 0))
+            for name, items in shard.items():
+                if isinstance(items, list):
+                    stitched.setdefault(name, []).extend(items)
+            boundary = len(stitched.get("body", {}).get("children", []))
+            for root in DoclingJsonStitcher._ROOTS:
+                if root in shard:
+                    stitched.setdefault(root, {**shard[root], "children": []})["children"].extend(shard[root].get("children", []))
+            stitched.setdefault("pages", {}).update(shard.get("pages", {}))
+            stitched = DoclingJsonStitcher._join_continued_table(stitched, boundary)
+        return stitched
+
+    @staticmethod
+    def _join_continued_table(document: Dict[str, Any], boundary: int) -> Dict[str, Any]:
+        """
+        Merge the table opening a shard (body child `boundary`) into the table closing the previous shard when they
+        have the same columns. Its first row is dropped when it repeats the header of the previous table, otherwise
+        it is a data row; the merged away table leaves the tables list and references to it point to the first one.
+        """
+        children = document.get("body", {}).get("children", [])
+        if boundary == 0 or boundary >= len(children):
+            return document
+        previous_match = _ITEM_REF_RE.match(children[boundary - 1].get("$ref", ""))
+        next_match     = _ITEM_REF_RE.match(children[boundary].get("$ref", ""))
+        if previous_match is None or next_match is None or previous_match.group(1) != "tables" or next_match.group(1) != "tables":
+            return document
+        tables        = document["tables"]
+        removed_index = int(next_match.group(2))
+        previous      = tables[int(previous_match.group(2))]
+        continued     = tables[removed_index]
+        data, continued_data = previous.get("data", {}), continued.get("data", {})
+        if not data.get("num_cols") or data.get("num_cols") != continued_data.get("num_cols"):
+            return document
+
+        first_row     = lambda table_data: [cell.get("text", "").strip() for cell in (table_data.get("grid") or [[]])[0]]
+        skipped_rows  = 1 if continued_data.get("grid") and first_row(continued_data) == first_row(data) else 0
+        row_offset    = data.get("num_rows", 0) - skipped_rows
+        shifted_cell  = lambda cell: {
+            **cell,
+            "start_row_offset_idx": cell["start_row_offset_idx"] + row_offset,
+            "end_row_offset_idx":   cell["end_row_offset_idx"] + row_offset,
+            "column_header":        False,
+        }
+        data["table_cells"] = data.get("table_cells", []) + [
+            shifted_cell(cell) for cell in continued_data.get("table_cells", []) if cell["start_row_offset_idx"] >= skipped_rows
+        ]
+        if "grid" in data:
+            data["grid"] = data["grid"] + [[shifted_cell(cell) for cell in row] for row in continued_data.get("grid", [])[skipped_rows:]]
+        data["num_rows"] = row_offset + continued_data.get("num_rows", 0)
+        for key in ("prov", "children", "captions", "references", "footnotes"):
+            if continued.get(key):
+                previous[key] = previous.get(key, []) + continued[key]
+
+        del children[boundary]
+        del tables[removed_index]
+        previous_index = int(previous_match.group(2))
+        return DoclingJsonStitcher._renumber(document, lambda name, index: index if name != "tables" or index < removed_index
+                                             else previous_index if index == removed_index else index - 1)
+
+    @staticmethod
+    def _renumber(value: Any, renumber: Callable[[str, int], int]) -> Any:
+        """Copy of `value` with every item reference (`$ref`, `self_ref`) renumbered by `renumber(list, index)`."""
+        if isinstance(value, dict):
+            return {
+                key: DoclingJsonStitcher._shift(item, renumber) if key in ("$ref", "self_ref") and isinstance(item, str)
+                else DoclingJsonStitcher._renumber(item, renumber)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [DoclingJsonStitcher._renumber(item, renumber) for item in value]
+        return value
+
+    @staticmethod
+    def _shift(ref: str, renumber: Callable[[str, int], int]) -> str:
+        match = _ITEM_REF_RE.match(ref)
+        if match is None:
+            return ref
+        return f"#/{match.group(1)}/{renumber(match.group(1), int(match.group(2)))}"
@@ -0,0 +1,308 @@
+from dataclasses import dataclass, field
+from typing      import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from src.domain.on_metal.nlp.chunker.text_chunker import TextChunker, guestimate_chars_per_token
+from src.domain.on_metal.nlp.tokenized_document   import TokenizedDocument
+
+from src.domain.on_metal.logger import get_logger
+logger = get_logger(__name__)
+
+# Page furniture repeated on every page, not content.
+_SKIPPED_LABELS  = {"page_header", "page_footer"}
+_HEADING_LABELS  = {"title", "section_header"}
+_LIST_LABELS     = {"list", "ordered_list"}
+_BLOCK_SEPARATOR = "\n\n"
+# Tokens of the separator between packed blocks, one for the usual BPE / WordPiece vocabularies.
+_SEPARATOR_TOKENS = 1
+_COUNT_BATCH_SIZE = 64
+
+
+@dataclass
+class StructuredChunk:
+    text:         str
+    section_path: List[str]
+    pages:        List[int]
+    labels:       List[str]
+    num_tokens:   int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "text":         self.text,
+            "section_path": self.section_path,
+            "pages":        self.pages,
+            "labels":       self.labels,
+            "num_tokens":   self.num_tokens,
+        }
+
+
+@dataclass
+class _Block:
+    """One structural element: a paragraph, a whole list (lines are items) or a whole table (lines are rows)."""
+    label:        str
+    lines:        List[str]
+    section_path: Tuple[str, ...]
+    pages:        Set[int]            = field(default_factory=set)
+    # Repeated on top of every piece of a split table.
+    header:       Optional[str]       = None
+    # Heading lines of the sections opened right before this block, kept glued to it.
+    headings:     List[str]           = field(default_factory=list)
+    num_tokens:   int                 = 0
+
+    @property
+    def text(self) -> str:
+        body = "\n".join(([self.header] if self.header else []) + self.lines)
+        return _BLOCK_SEPARATOR.join(self.headings + ([body] if body else []))
+
+
+class StructureChunker:
+    """
+    Chunks a docling document (its `export_to_dict` form, as kept in the conversion cache) along its structure:
+    the body tree is walked in reading order, sections, lists and tables are kept whole while they fit the token
+    budget, and consecutive small sections are packed together. Every chunk carries its section path (the common
+    heading path of its content) and the pages it comes from.
+    """
+
+    @staticmethod
+    def chunk(document: Dict[str, Any], tokenizer=None, max_tokens: int = 512, min_tokens: int = 128) -> List[StructuredChunk]:
+        chunks = list(StructureChunker.iter_chunks(document, tokenizer, max_tokens, min_tokens))
+        logger.debug(f"StructureChunker - {len(chunks)} chunks of up to {max_tokens} tokens")
+        return chunks
+
+    @staticmethod
+    def iter_chunks(document: Dict[str, Any], tokenizer=None, max_tokens: int = 512, min_tokens: int = 128) -> Iterator[StructuredChunk]:
+        """Chunks yielded as soon as they are complete, the document is walked and tokenized block batch by batch."""
+        current: List[_Block] = []
+        current_tokens = 0
+        blocks = StructureChunker._counted(StructureChunker._blocks(document), tokenizer)
+        for block in StructureChunker._fit(blocks, tokenizer, max_tokens):
+            needed      = block.num_tokens + (_SEPARATOR_TOKENS if current else 0)
+            new_section = bool(block.headings) or (bool(current) and block.section_path != current[-1].section_path)
+            # Sections start a new chunk unless the current one is still too small to stand alone.
+            if current and (current_tokens + needed > max_tokens or (new_section and current_tokens >= min_tokens)):
+                yield StructureChunker._to_chunk(current, current_tokens)
+                current, current_tokens, needed = [], 0, block.num_tokens
+            current.append(block)
+            current_tokens += needed
+        if current:
+            yield StructureChunker._to_chunk(current, current_tokens)
+
+    @staticmethod
+    def _blocks(document: Dict[str, Any]) -> Iterator[_Block]:
+        """Blocks of the document body in reading order, with the heading path they belong to."""
+        path: List[Tuple[int, str]] = []
+        pending_headings: List[str] = []
+
+        def walk(node: Dict[str, Any]) -> Iterator[_Block]:
+            for child_ref in node.get("children", []):
+                child = StructureChunker._resolve(document, child_ref)
+                if child is None or child.get("content_layer", "body") != "body":
+                    continue
+                label = child.get("label", "")
+                if label in _SKIPPED_LABELS:
+                    continue
+
+                if label in _HEADING_LABELS:
+                    level = 0 if label == "title" else int(child.get("level", 1))
+                    while path and path[-1][0] >= level:
+                        path.pop()
+                    path.append((level, child.get("text", "").strip()))
+                    pending_headings.append(f"{'#' * (level + 1)} {path[-1][1]}")
+                    yield from walk(child)
+                    continue
+
+                block = StructureChunker._to_block(document, child, label)
+                if block is None:
+                    # Groups other than lists (chapters, sections, inline text) only nest content.
+                    yield from walk(child)
+                    continue
+                block.section_path = tuple(text for _, text in path)
+                block.headings     = list(pending_headings)
+                pending_headings.clear()
+                yield block
+
+        yield from walk(document.get("body", {}))
+        if pending_headings:
+            # Headings closing the document without content, e.g. an empty appendix.
+            yield _Block("section_header", [], tuple(text for _, text in path), headings=list(pending_headings))
+
+    @staticmethod
+    def _to_block(document: Dict[str, Any], item: Dict[str, Any], label: str) -> Optional[_Block]:
+        if label in _LIST_LABELS:
+            lines, pages = [], set()
+            for index, list_item in enumerate(StructureChunker._list_items(document, item)):
+                marker = list_item.get("marker") or (f"{index + 1}." if label == "ordered_list" else "-")
+                lines.append(f"{marker} {list_item.get('text', '').strip()}")
+                pages |= StructureChunker._pages(list_item)
+            return _Block(label, lines, (), pages) if lines else None
+
+        if label == "table":
+            rows = StructureChunker._table_rows(item)
+            if not rows:
+                return None
+            captions = StructureChunker._captions(document, item)
+            header   = "\n".join(captions + rows[:2]) if len(rows) > 2 else None
+            lines    = rows[2:] if header else captions + rows
+            return _Block(label, lines, (), StructureChunker._pages(item), header=header)
+
+        if label == "picture":
+            captions = StructureChunker._captions(document, item)
+            return _Block(label, captions, (), StructureChunker._pages(item)) if captions else None
+
+        text = item.get("text", "").strip()
+        if text:
+            return _Block(label, [text], (), StructureChunker._pages(item))
+        return None
+
+    @staticmethod
+    def _list_items(document: Dict[str, Any], group: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for child_ref in group.get("children", []):
+            child = StructureChunker._resolve(document, child_ref)
+            if child is None:
+                continue
+            if child.get("label") in _LIST_LABELS:
+                yield from StructureChunker._list_items(document, child)
+            elif child.get("text", "").strip():
+                yield child
+
+    @staticmethod
+    def _table_rows(table: Dict[str, Any]) -> List[str]:
+        """Markdown rows of the table grid: header row, separator, data rows."""
+        data = table.get("data") or {}
+        grid = data.get("grid")
+        if not grid:
+            grid = [["" for _ in range(data.get("num_cols", 0))] for _ in range(data.get("num_rows", 0))]
+            for cell in data.get("table_cells", []):
+                row, column = cell.get("start_row_offset_idx", 0), cell.get("start_col_offset_idx", 0)
+                if row < len(grid) and column < len(grid[row]):
+                    grid[row][column] = cell
+        rows = []
+        for row in grid:
+            texts = [(cell.get("text", "") if isinstance(cell, dict) else str(cell)).replace("\n", " ").strip() for cell in row]
+            rows.append(f"| {' | '.join(texts)} |")
+        if len(rows) > 1:
+            rows.insert(1, f"|{'---|' * len(grid[0])}")
+        return rows
+
+    @staticmethod
+    def _captions(document: Dict[str, Any], item: Dict[str, Any]) -> List[str]:
+        captions = [StructureChunker._resolve(document, ref) for ref in item.get("captions", [])]
+        return [caption.get("text", "").strip() for caption in captions if caption and caption.get("text", "").strip()]
+
+    @staticmethod
+    def _pages(item: Dict[str, Any]) -> Set[int]:
+        return {provenance["page_no"] for provenance in item.get("prov", []) if "page_no" in provenance}
+
+    @staticmethod
+    def _resolve(document: Dict[str, Any], ref: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Follow a json pointer like {"$ref": "#/texts/12"}."""
+        try:
+            _, collection, index = ref["$ref"].split("/")
+            return document[collection][int(index)]
+        except (KeyError, ValueError, IndexError, TypeError):
+            return None
+
+    @staticmethod
+    def _counted(blocks: Iterable[_Block], tokenizer) -> Iterator[_Block]:
+        """Blocks with their token count, tokenized `_COUNT_BATCH_SIZE` blocks per tokenizer call."""
+        batch = []
+        for block in blocks:
+            batch.append(block)
+            if len(batch) == _COUNT_BATCH_SIZE:
+                StructureChunker._count_tokens(batch, tokenizer)
+                yield from batch
+                batch = []
+        StructureChunker._count_tokens(batch, tokenizer)
+        yield from batch
+
+    @staticmethod
+    def _count_tokens(blocks: List[_Block], tokenizer):
+        texts = [block.text for block in blocks]
+        for block, num_tokens in zip(blocks, StructureChunker._token_counts(texts, tokenizer)):
+            block.num_tokens = num_tokens
+
+    @staticmethod
+    def _token_counts(texts: List[str], tokenizer) -> List[int]:
+        if not texts:
+            return []
+        if tokenizer is None:
+            return [max(1, len(text) // guestimate_chars_per_token) for text in texts]
+        return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+    @staticmethod
+    def _fit(blocks: Iterable[_Block], tokenizer, max_tokens: int) -> Iterator[_Block]:
+        """Blocks within the budget as they are; larger ones split by lines (rows, items), then by tokens."""
+        for block in blocks:
+            if block.num_tokens <= max_tokens:
+                yield block
+                continue
+            if len(block.lines) > 1:
+                pieces = StructureChunker._split_lines(block, tokenizer, max_tokens)
+                if len(pieces) > 1:
+                    yield from StructureChunker._fit(pieces, tokenizer, max_tokens)
+                    continue
+
+            text = block.text
+            if tokenizer is not None:
+                tokenized = TokenizedDocument(text)
+                spans     = TextChunker._token_spans(tokenized.offsets(tokenizer), max_tokens, 0)
+                pieces    = [_Block(block.label, [tokenized.span_text(tokenizer, start, end)], block.section_path, block.pages, num_tokens=end - start) for start, end in spans]
+            else:
+                pieces = [_Block(block.label, [piece], block.section_path, block.pages, num_tokens=max_tokens) for piece in StructureChunker._split_chars(text, max_tokens * guestimate_chars_per_token)]
+            yield from pieces
+
+    @staticmethod
+    def _split_chars(text: str, max_chars: int) -> Iterator[str]:
+        """Pieces of at most `max_chars`, cut at the last whitespace when there is one."""
+        start = 0
+        while start < len(text):
+            end = min(len(text), start + max_chars)
+            if end < len(text):
+                space = text.rfind(" ", start + 1, end)
+                end   = space if space > start else end
+            yield text[start:end].strip()
+            start = end
+
+    @staticmethod
+    def _split_lines(block: _Block, tokenizer, max_tokens: int) -> List[_Block]:
+        """Consecutive lines of a list or table packed under the budget; table pieces repeat the header."""
+        prefix       = _Block(block.label, [], block.section_path, header=block.header, headings=block.headings)
+        prefix_tokens, *line_tokens = StructureChunker._token_counts([prefix.text] + block.lines, tokenizer)
+        pieces, lines, tokens = [], [], prefix_tokens
+        for line, num_tokens in zip(block.lines, line_tokens):
+            if lines and tokens + num_tokens + 1 > max_tokens:
+                pieces.append(lines)
+                lines, tokens = [], prefix_tokens if block.header else 0
+            lines.append(line)
+            tokens += num_tokens + 1
+
+        if lines:
+            pieces.append(lines)
+        split = []
+        for index, lines in enumerate(pieces):
+            split.append(_Block(
+                block.label, lines, block.section_path, block.pages,
+                header=block.header, headings=block.headings if index == 0 else [],
+            ))
+        StructureChunker._count_tokens(split, tokenizer)
+        return split
+
+    @staticmethod
+    def _to_chunk(blocks: List[_Block], num_tokens: int) -> StructuredChunk:
+        section_path = list(blocks[0].section_path)
+        for block in blocks[1:]:
+            common = 0
+            while common < min(len(section_path), len(block.section_path)) and section_path[common] == block.section_path[common]:
+                common += 1
+            section_path = section_path[:common]
+        labels = []
+        for block in blocks:
+            if block.label not in labels:
+                labels.append(block.label)
+        return StructuredChunk(
+            text=_BLOCK_SEPARATOR.join(block.text for block in blocks),
+            section_path=section_path,
+            pages=sorted(set().union(*(block.pages for block in blocks))),
+            labels=labels,
+            num_tokens=num_tokens,
+        )
+
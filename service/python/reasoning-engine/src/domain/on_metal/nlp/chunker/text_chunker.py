@@ -1,9 +1,11 @@
 import math
 import logging
-from argparse import ArgumentError
-from typing import List
+from dataclasses import dataclass, field
+from typing import Any, Generator, Iterable, Iterator, List, Optional, Tuple
 
-from src.domain.on_metal.context.vram_memory import VRamMemory
+import numpy as np
+
+from src.domain.on_metal.nlp.tokenized_document import TokenizedDocument
 from src.domain.on_metal.logger import get_logger
 logger = get_logger(__name__)
 
@@ -11,135 +13,220 @@ logger = get_logger(__name__)
 # @todo improve the guestimate approach
 guestimate_chars_per_token = 4
 guestimate_overlap_tokens = 50
+# Chunk boundaries move back at most this many tokens to avoid cutting a word.
+_MAX_WORD_START_LOOKBACK = 16
+
+
+@dataclass(frozen=True)
+class ChunkRecord:
+    """
+    A chunk as spans of its document: characters [char_start, char_end) and tokens [token_start, token_end).
+    Text is sliced on access and token ids are a view of the document ids, so records stay a few ints each.
+    """
+    index:       int
+    char_start:  int
+    char_end:    int
+    token_start: int
+    token_end:   int
+    document:    TokenizedDocument = field(repr=False, compare=False)
+    tokenizer:   Any               = field(default=None, repr=False, compare=False)
+
+    @property
+    def text(self) -> str:
+        return self.document.text[self.char_start:self.char_end]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.document.ids(self.tokenizer)[self.token_start:self.token_end]
+
+    @property
+    def num_tokens(self) -> int:
+        return self.token_end - self.token_start
+
 
 class TextChunker:
 
     @staticmethod
-    def token_chunks_that_fit_in_memory(full_text: str, tokenizer=None, ensure_free_kbs: int = 0, min_num_of_chunks: int = 1) -> List[str]:
-        if tokenizer is not None:
-            full_text_tokens = tokenizer.encode(full_text)
-            full_text_num_tokens = len(full_text_tokens)
-        else:
-            raise ArgumentError("tokenizer", "Tokenizer cannot be None.")
-            #@todo argument type above
+    def window_chunks(full_text: str, tokenizer, max_input_tokens: int, overlap_tokens: int = 0, min_num_of_chunks: int = 1, document: Optional[TokenizedDocument] = None) -> List[str]:
+        """
+        Fewest chunks that fit the model input window (`max_input_tokens` minus the special tokens the tokenizer
+        adds), consecutive chunks sharing `overlap_tokens`. The text is tokenized once and chunk sizes are balanced,
+        so no chunk gets truncated by the model and the last one is not a small leftover.
+        """
+        document = document or TokenizedDocument(full_text)
+        window   = max_input_tokens - tokenizer.num_special_tokens_to_add()
+        chunks   = []
+        spans    = TextChunker._window_spans(document, tokenizer, max_input_tokens, overlap_tokens, min_num_of_chunks)
+        span     = next(spans, None)
+        while span is not None:
+            start, end = span
+            text = document.span_text(tokenizer, start, end)
+            # A slice can re-tokenize a little longer at its edges; shrink until it fits the window.
+            excess = len(tokenizer.encode(text, add_special_tokens=False)) - window
+            while excess > 0 and end - start > excess:
+                end   -= excess
+                text   = document.span_text(tokenizer, start, end)
+                excess = len(tokenizer.encode(text, add_special_tokens=False)) - window
+            chunks.append(text)
+            # The next span starts from the shrunk end, so the tokens cut off are not dropped.
+            try:
+                span = spans.send(end)
+            except StopIteration:
+                span = None
 
-        max_context_size_tokens = VRamMemory().get_max_context_size(units="tokens")
-        max_context_size_tokens -= ensure_free_kbs / guestimate_chars_per_token
+        return chunks
 
-        num_chunks            = max(min_num_of_chunks, math.ceil(full_text_num_tokens / max_context_size_tokens))
-        tokens_size_per_chunk = full_text_num_tokens / num_chunks
+    @staticmethod
+    def iter_window_chunks(document: TokenizedDocument, tokenizer, max_input_tokens: int, overlap_tokens: int = 0, min_num_of_chunks: int = 1) -> Iterator[ChunkRecord]:
+        """Lazy `window_chunks` as ChunkRecords, for callers feeding the token ids to the model directly."""
+        yield from TextChunker._records(document, tokenizer, TextChunker._window_spans(document, tokenizer, max_input_tokens, overlap_tokens, min_num_of_chunks))
 
-        logger.debug(f"TextChunker - Text contains {len(full_text)} chars and {full_text_num_tokens} tokens.")
-        logger.debug(f"TextChunker - Split text into {num_chunks} chunks based on token count of {tokens_size_per_chunk} tokens each.")
+    @staticmethod
+    def _window_spans(document: TokenizedDocument, tokenizer, max_input_tokens: int, overlap_tokens: int = 0, min_num_of_chunks: int = 1) -> Generator[Tuple[int, int], Optional[int], None]:
+        """
+        [start, end) token spans of `window_chunks`. Span ends aim at the balanced chunk size and are cut at word
+        starts only within the room the following spans leave (`_lowest_bounds`), so cutting at word starts never
+        adds a chunk. The final end of a span can be sent back (e.g. after shrinking it), the next span starts from it.
+        """
+        window = max_input_tokens - tokenizer.num_special_tokens_to_add()
+        if overlap_tokens >= window:
+            raise ValueError("overlap_tokens must be lower than the model input window.")
 
-        chunks = TextChunker._chunk(full_text, num_chunks, tokenizer, tokens_size_per_chunk, guestimate_overlap_tokens)
+        offsets    = document.offsets(tokenizer)
+        num_tokens = len(offsets)
+        if num_tokens == 0:
+            return
 
-        return chunks
+        num_chunks     = max(min_num_of_chunks, 1 if num_tokens <= window else math.ceil((num_tokens - overlap_tokens) / (window - overlap_tokens)))
+        chunk_size     = min(window, math.ceil((num_tokens + overlap_tokens * (num_chunks - 1)) / num_chunks))
+        overlap_tokens = min(overlap_tokens, chunk_size - 1)
+        stride         = chunk_size - overlap_tokens
+        logger.debug(f"TextChunker - {num_tokens} tokens into {num_chunks} chunks of ~{chunk_size} tokens (window {window}, overlap {overlap_tokens}).")
+
+        lowest_starts, lowest_ends = TextChunker._lowest_bounds(num_tokens, num_chunks, window, overlap_tokens)
+        start = 0
+        index = 0
+        while start < num_tokens:
+            highest_end = min(num_tokens, start + window)
+            lowest_end  = min(highest_end, lowest_ends[index]) if index < num_chunks else start + 1
+            end         = max(lowest_end, min(overlap_tokens + (index + 1) * stride, highest_end))
+            if end < num_tokens:
+                end = TextChunker._word_start(offsets, end, max(start + 1, lowest_end))
+            final_end = yield start, end
+            if final_end is not None:
+                end = final_end
+            if end >= num_tokens:
+                return
+            index += 1
+            lowest_start = lowest_starts[index] if index < num_chunks else 0
+            start = TextChunker._word_start(offsets, max(start + 1, end - overlap_tokens), max(start + 1, lowest_start))
 
     @staticmethod
-    def _chunk(full_text: str, num_chunks: int, tokenizer, tokens_size_per_chunk: float, overlap_tokens: int = 0) -> List[str]:
-        words = full_text.split()
-        total_tokens = len(tokenizer.encode(full_text))
-        # Adjust min_tokens considering overlap
-        effective_total = total_tokens + (overlap_tokens * (num_chunks - 1))
-        min_tokens_per_chunk = effective_total / num_chunks
-        
-        chunks = []
-        current_chunk = ""
-        current_chunk_words = []
-        current_tokens = 0
-        overlap_words = []
-        overlap_tokens_count = 0
-        
-        for word in words:
-            word_tokens = len(tokenizer.encode(word))
-            
-            # If this chunk is full (considering overlap requirement)
-            if current_tokens + word_tokens > tokens_size_per_chunk - overlap_tokens:
-                # Store the current chunk
-                chunks.append(current_chunk.strip())
-                
-                # Initialize next chunk with overlap words
-                if overlap_tokens > 0:
-                    # Calculate overlap from current chunk
-                    overlap_words = []
-                    overlap_tokens_count = 0
-                    for w in reversed(current_chunk_words):
-                        w_tokens = len(tokenizer.encode(w))
-                        if overlap_tokens_count + w_tokens > overlap_tokens:
-                            break
-                        overlap_words.insert(0, w)
-                        overlap_tokens_count += w_tokens
-                    
-                    # Start new chunk with overlap
-                    current_chunk = " ".join(overlap_words)
-                    current_chunk_words = overlap_words.copy()
-                    current_tokens = overlap_tokens_count
-                else:
-                    current_chunk = ""
-                    current_chunk_words = []
-                    current_tokens = 0
-            
-            # Add the current word
-            current_chunk += " " + word if current_chunk else word
-            current_chunk_words.append(word)
-            current_tokens += word_tokens
-        
-        # Add the last chunk if there's anything left
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-            
-        # Adjust number of chunks if needed
-        while len(chunks) < num_chunks:
-            # Find the chunk with the most tokens
-            chunk_tokens = [(i, len(tokenizer.encode(chunk))) 
-                          for i, chunk in enumerate(chunks)]
-            largest_idx, _ = max(chunk_tokens, key=lambda x: x[1])
-            
-            # Split the largest chunk
-            words_to_split = chunks[largest_idx].split()
-            mid = len(words_to_split) // 2
-            
-            # Calculate overlap for the split
-            overlap_start = max(0, mid - (overlap_tokens // 2))
-            overlap_end = min(len(words_to_split), mid + (overlap_tokens // 2))
-            
-            first_half = " ".join(words_to_split[:overlap_end])
-            second_half = " ".join(words_to_split[overlap_start:])
-            
-            chunks[largest_idx] = first_half
-            chunks.insert(largest_idx + 1, second_half)
-        
-        # If we have too many chunks, combine smallest adjacent pairs
-        while len(chunks) > num_chunks:
-            smallest_pair_idx = 0
-            smallest_pair_tokens = float('inf')
-            
-            for i in range(len(chunks) - 1):
-                combined = chunks[i] + " " + chunks[i + 1]
-                pair_tokens = len(tokenizer.encode(combined))
-                if pair_tokens < smallest_pair_tokens and pair_tokens <= tokens_size_per_chunk:
-                    smallest_pair_idx = i
-                    smallest_pair_tokens = pair_tokens
-            
-            # Combine the smallest pair
-            chunks[smallest_pair_idx] = chunks[smallest_pair_idx] + " " + chunks[smallest_pair_idx + 1]
-            chunks.pop(smallest_pair_idx + 1)
-            
-        return chunks
+    def _lowest_bounds(num_tokens: int, num_chunks: int, window: int, overlap_tokens: int) -> Tuple[List[int], List[int]]:
+        """
+        Lowest start and end of every span such that the spans after it, of up to `window` tokens and sharing
+        `overlap_tokens`, still reach the end of the document. Computed backwards from the last span.
+        """
+        lowest_starts = [0] * num_chunks
+        lowest_ends   = [num_tokens] * num_chunks
+        for index in range(num_chunks - 1, 0, -1):
+            lowest_starts[index]   = max(0, lowest_ends[index] - window)
+            lowest_ends[index - 1] = min(num_tokens, lowest_starts[index] + overlap_tokens)
+        return lowest_starts, lowest_ends
 
     @staticmethod
-    def split_for_map_reduce(text: str, tokenizer, chunk_size: int = 4000, chunk_overlap: int = 200) -> List[str]:
+    def _chunk(full_text: str, num_chunks: int, tokenizer, tokens_size_per_chunk: float, overlap_tokens: int = 0, document: Optional[TokenizedDocument] = None) -> List[str]:
+        document = document or TokenizedDocument(full_text)
+        return [record.text.strip() for record in TextChunker.iter_chunks(document, tokenizer, num_chunks, overlap_tokens)]
+
+    @staticmethod
+    def iter_chunks(document: TokenizedDocument, tokenizer, num_chunks: int, overlap_tokens: int = 0) -> Iterator[ChunkRecord]:
+        """
+        Exactly `num_chunks` chunks (or one per token on shorter documents) of about the same number of tokens,
+        consecutive chunks sharing about `overlap_tokens`. Boundaries are index arithmetic on the token offsets of
+        one tokenizer pass, moved back to the closest word start, and chunks are spans of the original text.
+        """
+        num_tokens = document.num_tokens(tokenizer)
+        if num_tokens == 0:
+            return
+
+        num_chunks     = max(1, min(num_chunks, num_tokens))
+        chunk_size     = max(1, math.ceil((num_tokens + overlap_tokens * (num_chunks - 1)) / num_chunks))
+
+        yield from TextChunker._records(document, tokenizer, TextChunker._token_spans(document.offsets(tokenizer), num_chunks, chunk_size))
+
+    @staticmethod
+    def _records(document: TokenizedDocument, tokenizer, spans: Iterable[Tuple[int, int]]) -> Iterator[ChunkRecord]:
+        offsets = document.offsets(tokenizer)
+        for index, (start, end) in enumerate(spans):
+            yield ChunkRecord(index, int(offsets[start][0]), int(offsets[end - 1][1]), start, end, document, tokenizer)
+
+    @staticmethod
+    def _token_spans(offsets: np.ndarray, num_chunks: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+        """
+        `num_chunks` [start, end) token spans of about `chunk_size` tokens covering all tokens. Starts are spread
+        evenly and moved back to word starts, ends are cut at word starts but never before the next span starts.
+        """
+        num_tokens = len(offsets)
+        # Shorter spans on tiny or heavily overlapped documents, so every span still starts on its own token.
+        chunk_size = min(chunk_size, num_tokens - num_chunks + 1)
+        stride     = (num_tokens - chunk_size) / (num_chunks - 1) if num_chunks > 1 else 0
+        starts     = [0]
+        for index in range(1, num_chunks):
+            starts.append(TextChunker._word_start(offsets, round(index * stride), starts[-1] + 1))
+
+        for index, start in enumerate(starts):
+            if index == num_chunks - 1:
+                yield start, num_tokens
+                return
+            next_start = starts[index + 1]
+            yield start, max(next_start, TextChunker._word_start(offsets, start + chunk_size, next_start))
+
+    @staticmethod
+    def _word_start(offsets: np.ndarray, index: int, lowest: int) -> int:
+        """Closest token at or before `index` (and not before `lowest`) that starts a word, i.e. follows a gap."""
+        for candidate in range(index, max(lowest, index - _MAX_WORD_START_LOOKBACK) - 1, -1):
+            if candidate == 0 or offsets[candidate][0] > offsets[candidate - 1][1]:
+                return candidate
+        return index
+
+    @staticmethod
+    def split_for_map_reduce(text: str, tokenizer, chunk_size: int = 4000, chunk_overlap: int = 200, document: Optional[TokenizedDocument] = None) -> List[str]:
         """Split text into overlapping chunks for map-reduce summarization"""
         if not text:
             return []
-            
-        tokens = tokenizer.encode(text)
-        chunks = []
-        
-        for i in range(0, len(tokens), chunk_size - chunk_overlap):
-            chunk_tokens = tokens[i:i + chunk_size]
-            chunk_text = tokenizer.decode(chunk_tokens, skip_special_tokens=True)
-            chunks.append(chunk_text)
-            
-        return chunks
\ No newline at end of file
+
+        document = document or TokenizedDocument(text)
+        return [record.text for record in TextChunker.iter_map_reduce_chunks(document, tokenizer, chunk_size, chunk_overlap)]
+
+    @staticmethod
+    def iter_map_reduce_chunks(document: TokenizedDocument, tokenizer, chunk_size: int = 4000, chunk_overlap: int = 200) -> Iterator[ChunkRecord]:
+        """Fixed size chunks of `chunk_size` tokens, starting every `chunk_size - chunk_overlap` tokens."""
+        num_tokens = document.num_tokens(tokenizer)
+        spans      = ((i, min(i + chunk_size, num_tokens)) for i in range(0, num_tokens, chunk_size - chunk_overlap))
+        yield from TextChunker._records(document, tokenizer, spans)
+
+    @staticmethod
+    def stream_token_chunks(texts: Iterable[str], tokenizer, max_tokens: int, overlap_tokens: int = 0) -> Iterator[str]:
+        """
+        Chunk a stream of texts (e.g. markdown page windows) into chunks of `max_tokens` tokens as they arrive.
+        Only the tokens of the current chunk are buffered, whatever the length of the stream.
+        """
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be lower than max_tokens.")
+
+        buffer: List[int] = []
+        new_tokens        = 0  # Tokens in the buffer not yet part of any yielded chunk.
+        has_yielded       = False
+        for text in texts:
+            text_tokens = tokenizer.encode(text, add_special_tokens=False)
+            buffer.extend(text_tokens)
+            new_tokens += len(text_tokens)
+            while len(buffer) >= max_tokens:
+                yield tokenizer.decode(buffer[:max_tokens], skip_special_tokens=True)
+                has_yielded = True
+                buffer      = buffer[max_tokens - overlap_tokens:]
+                new_tokens  = len(buffer) - overlap_tokens
+
+        if new_tokens > 0 or (buffer and not has_yielded):
+            yield tokenizer.decode(buffer, skip_special_tokens=True)
@@ -0,0 +1,175 @@
+import re
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.config.analysis_config                 import AnalysisConfig
+from src.domain.on_metal.nlp.tokenized_document import TokenizedDocument
+
+from src.domain.on_metal.logger import get_logger
+logger = get_logger(__name__)
+
+# Hashed bag of words dimensions, collisions barely move the ranking at this size.
+_FEATURE_DIM       = 2048
+_DAMPING           = 0.85
+_MAX_ITERATIONS    = 50
+_TOLERANCE         = 1e-6
+# Paragraphs longer than this are ranked sentence by sentence.
+_MAX_UNIT_CHARS    = 1200
+_MIN_UNIT_CHARS    = 20
+_CHARS_PER_TOKEN   = 4
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT  = re.compile(r"(?<=[.!?])\s+")
+_WORD            = re.compile(r"\w{3,}")
+
+
+class TextRank:
+    """
+    Extractive reduction before abstractive summarization: paragraphs (or sentences of long ones) are ranked by
+    TextRank over tf-idf cosine similarity, and the best ones are kept, in document order, under a token budget.
+    The similarity graph is never materialized: with unit normalized rows X, S = X Xᵀ and every power iteration
+    step is two matrix-vector products, linear in the number of units.
+    """
+
+    @staticmethod
+    def budget_for(num_tokens: int) -> Optional[int]:
+        """Token budget of a document by size (`AnalysisConfig.EXTRACTIVE_BUDGETS`), None to keep it whole."""
+        budget = None
+        for min_tokens, budget_tokens in AnalysisConfig.EXTRACTIVE_BUDGETS:
+            if num_tokens >= min_tokens:
+                budget = budget_tokens
+        return budget
+
+    @staticmethod
+    def stream_keep_ratio() -> float:
+        """Share of each window kept when the whole document is not known upfront: the ratio of the largest tier."""
+        if not AnalysisConfig.EXTRACTIVE_BUDGETS:
+            return 1.0
+        min_tokens, budget_tokens = AnalysisConfig.EXTRACTIVE_BUDGETS[-1]
+        return min(1.0, budget_tokens / min_tokens)
+
+    @staticmethod
+    def reduce(text: str, tokenizer=None, budget_tokens: Optional[int] = None, keep_ratio: Optional[float] = None, document: Optional[TokenizedDocument] = None) -> str:
+        """
+        Keep the most central units of `text` within `budget_tokens` (or `keep_ratio` of its tokens).
+        Without either, the budget comes from the document size tiers. Returns the text unchanged when it fits.
+        With the `document` of the text, units are counted on its tokenization instead of tokenized again.
+        """
+        spans = TextRank.unit_spans(text)
+        if len(spans) < 2:
+            return text
+
+        units        = [text[start:end] for start, end in spans]
+        unit_tokens  = TextRank._count_tokens(units, tokenizer, spans, document)
+        total_tokens = int(unit_tokens.sum())
+        if keep_ratio is not None:
+            budget_tokens = int(total_tokens * keep_ratio)
+        elif budget_tokens is None:
+            budget_tokens = TextRank.budget_for(total_tokens)
+        if budget_tokens is None or total_tokens <= budget_tokens:
+            return text
+
+        scores = TextRank.scores(units)
+        kept   = TextRank._select(scores, unit_tokens, budget_tokens)
+        logger.debug(f"TextRank - Kept {len(kept)}/{len(units)} units, {int(unit_tokens[kept].sum()):,}/{total_tokens:,} tokens (budget {budget_tokens:,})")
+        return "\n\n".join(units[i] for i in kept)
+
+    @staticmethod
+    def split_units(text: str) -> List[str]:
+        return [text[start:end] for start, end in TextRank.unit_spans(text)]
+
+    @staticmethod
+    def unit_spans(text: str) -> List[Tuple[int, int]]:
+        """(start, end) character spans of the paragraphs of `text`, and of the sentences of long paragraphs."""
+        spans = []
+        for paragraph_start, paragraph_end in TextRank._split_spans(text, _PARAGRAPH_SPLIT, 0, len(text)):
+            start, end = TextRank._strip_span(text, paragraph_start, paragraph_end)
+            if end - start < _MIN_UNIT_CHARS:
+                continue
+            if end - start <= _MAX_UNIT_CHARS:
+                spans.append((start, end))
+            else:
+                spans += [(s, e) for s, e in TextRank._split_spans(text, _SENTENCE_SPLIT, start, end) if e - s >= _MIN_UNIT_CHARS]
+        return spans
+
+    @staticmethod
+    def _split_spans(text: str, separator: re.Pattern, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        position = start
+        for match in separator.finditer(text, start, end):
+            yield position, match.start()
+            position = match.end()
+        yield position, end
+
+    @staticmethod
+    def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+
+    @staticmethod
+    def scores(units: List[str]) -> np.ndarray:
+        features = TextRank._tf_idf(units)
+        n = len(units)
+
+        # Degree of each unit in the similarity graph, without the self loop (normalized rows: S_ii = 1 or 0).
+        self_similarity = (features * features).sum(axis=1)
+        degree          = features @ features.sum(axis=0) - self_similarity
+        has_edges       = degree > 0
+        inverse_degree  = np.zeros(n, dtype=np.float32)
+        inverse_degree[has_edges] = 1.0 / degree[has_edges]
+
+        rank = np.full(n, 1.0 / n, dtype=np.float32)
+        for _ in range(_MAX_ITERATIONS):
+            flow     = rank * inverse_degree
+            new_rank = (1 - _DAMPING) / n + _DAMPING * (features @ (features.T @ flow) - self_similarity * flow)
+            # Units without edges keep the teleport share only, their rank mass is spread evenly.
+            new_rank += _DAMPING * rank[~has_edges].sum() / n
+            if np.abs(new_rank - rank).sum() < _TOLERANCE:
+                rank = new_rank
+                break
+            rank = new_rank
+        return rank
+
+    @staticmethod
+    def _tf_idf(units: List[str]) -> np.ndarray:
+        rows, columns = [], []
+        for row, unit in enumerate(units):
+            for word in _WORD.findall(unit.lower()):
+                rows.append(row)
+                columns.append(zlib.crc32(word.encode("utf-8")) % _FEATURE_DIM)
+
+        counts = np.zeros((len(units), _FEATURE_DIM), dtype=np.float32)
+        np.add.at(counts, (np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64)), 1.0)
+
+        document_frequency = (counts > 0).sum(axis=0)
+        idf      = np.log((1 + len(units)) / (1 + document_frequency)).astype(np.float32) + 1.0
+        features = np.log1p(counts) * idf
+        norms    = np.linalg.norm(features, axis=1, keepdims=True)
+        np.divide(features, norms, out=features, where=norms > 0)
+        return features
+
+    @staticmethod
+    def _count_tokens(units: List[str], tokenizer, spans: Optional[List[Tuple[int, int]]] = None, document: Optional[TokenizedDocument] = None) -> np.ndarray:
+        if tokenizer is None:
+            return np.asarray([max(1, len(unit) // _CHARS_PER_TOKEN) for unit in units], dtype=np.int64)
+        if document is not None and spans is not None:
+            # Tokens starting inside each unit span.
+            token_starts = document.offsets(tokenizer)[:, 0]
+            bounds       = np.asarray(spans, dtype=np.int64)
+            return (np.searchsorted(token_starts, bounds[:, 1]) - np.searchsorted(token_starts, bounds[:, 0])).astype(np.int64)
+        input_ids = tokenizer(units, add_special_tokens=False)["input_ids"]
+        return np.asarray([len(ids) for ids in input_ids], dtype=np.int64)
+
+    @staticmethod
+    def _select(scores: np.ndarray, unit_tokens: np.ndarray, budget_tokens: int) -> List[int]:
+        """Best scored units that fit the budget, back in document order."""
+        kept, used = [], 0
+        for index in np.argsort(-scores, kind="stable"):
+            if used + unit_tokens[index] <= budget_tokens:
+                kept.append(int(index))
+                used += int(unit_tokens[index])
+        return sorted(kept)
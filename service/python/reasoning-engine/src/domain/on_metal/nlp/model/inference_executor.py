@@ -0,0 +1,111 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing             import Any, Callable, Optional
+
+from src.domain.on_metal.logger import get_logger
+logger = get_logger(__name__)
+
+
+class InferenceCancelled(Exception):
+    """Inference stopped before completion: the task was revoked, the file is gone or the caller gave up."""
+
+
+class InferenceTimeout(InferenceCancelled):
+    """Inference stopped because the document deadline passed."""
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation of a blocking inference: the inference thread calls `raise_if_cancelled` between
+    chunks, and stops once the token is cancelled, its deadline is past or `is_valid` returns False.
+    The deadline runs from creation, or with `started=False` from the `start` call, so time spent queued
+    before the inference does not count against it.
+    """
+    def __init__(self, timeout_seconds: Optional[float] = None, is_valid: Optional[Callable[[], bool]] = None, started: bool = True):
+        self.timeout_seconds = timeout_seconds
+        self.deadline: Optional[float] = None
+        self._is_valid = is_valid
+        self._event    = threading.Event()
+        self.reason: Optional[str] = None
+        if started:
+            self.start()
+
+    def start(self):
+        """Start the deadline, once; until then only `cancel` and `is_valid` stop the token."""
+        if self.deadline is None and self.timeout_seconds is not None:
+            self.deadline = time.monotonic() + self.timeout_seconds
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def raise_if_cancelled(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+            raise InferenceTimeout(self.reason)
+        if not self._event.is_set() and self._is_valid is not None and not self._is_valid():
+            self.cancel("no longer valid")
+        if self._event.is_set():
+            raise InferenceCancelled(self.reason)
+
+
+class InferenceExecutor:
+    """
+    Runs blocking model inference off the event loop, on a dedicated thread (one model instance, one caller at
+    a time), and hands back awaitables. Awaiting callers that are cancelled or time out cancel the token, so the
+    inference itself stops at its next check instead of running to completion in the background.
+    """
+    _shared: Optional["InferenceExecutor"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, name: str = "inference"):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    @classmethod
+    def shared(cls) -> "InferenceExecutor":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    async def run(self, fn: Callable, *args, cancellation: Optional[CancellationToken] = None, **kwargs) -> Any:
+        """Await `fn(*args, **kwargs)`; with a token, it is passed as `cancellation=` and bounds the wait."""
+        if cancellation is not None:
+            kwargs["cancellation"] = cancellation
+        loop   = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        if cancellation is None:
+            return await future
+
+        try:
+            # Shielded: on timeout the thread keeps the call until its next check, the token stops it there.
+            return await asyncio.wait_for(asyncio.shield(future), timeout=cancellation.remaining())
+        except asyncio.TimeoutError:
+            future.add_done_callback(self._discard_result)
+            cancellation.cancel("deadline exceeded")
+            logger.warning(f"Inference - {getattr(fn, '__name__', fn)} passed its deadline, cancelling it.")
+            raise InferenceTimeout(cancellation.reason)
+        except asyncio.CancelledError:
+            future.add_done_callback(self._discard_result)
+            cancellation.cancel("caller cancelled")
+            raise
+
+    @staticmethod
+    def _discard_result(future: asyncio.Future):
+        # Nobody awaits an abandoned call anymore, its InferenceCancelled is expected.
+        if not future.cancelled():
+            future.exception()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,126 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing     import Dict, List
+
+from src.config.analysis_config   import AnalysisConfig
+from src.config.repository_config import DOCS_REPOSITORY_PATH
+
+from src.domain.on_metal.logger import get_logger
+logger = get_logger(__name__)
+
+# SQLite caps the number of bound parameters per statement.
+_IN_LIST_SIZE = 500
+
+
+class SummaryCache:
+    """
+    Persistent cache of chunk summaries. Generation is deterministic (no sampling), so a summary is keyed by
+    the sha256 of the chunk text plus the generation key of the summarizer (model, revision, dtype, generate
+    arguments). Bounded in size, the least recently used entries are evicted first.
+    """
+    PATH      = DOCS_REPOSITORY_PATH / "summary_cache.sqlite"
+    MAX_BYTES = AnalysisConfig.SUMMARY_CACHE_MAX_MB * 1024 * 1024
+
+    _schema_ready = False
+    _stats_lock   = threading.Lock()
+    _stats        = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def cache_key(chunk: str, generation_key: str) -> str:
+        digest = hashlib.sha256(generation_key.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(chunk.encode("utf-8"))
+        return digest.hexdigest()
+
+    @classmethod
+    def get_many(cls, keys: List[str]) -> Dict[str, str]:
+        """Cached summaries by key; missing keys are left out of the result."""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with cls._connect() as connection:
+            for start in range(0, len(unique_keys), _IN_LIST_SIZE):
+                batch = unique_keys[start:start + _IN_LIST_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                found.update(connection.execute(
+                    f"SELECT cache_key, summary FROM summary WHERE cache_key IN ({placeholders})", batch
+                ).fetchall())
+                connection.execute(
+                    f"UPDATE summary SET last_access = ? WHERE cache_key IN ({placeholders})", [time.time(), *batch]
+                )
+        cls._count(hits=sum(1 for key in keys if key in found), misses=sum(1 for key in keys if key not in found))
+        return found
+
+    @classmethod
+    def put_many(cls, summaries: Dict[str, str]):
+        if not summaries:
+            return
+        now = time.time()
+        with cls._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO summary (cache_key, summary, size, last_access) VALUES (?, ?, ?, ?)",
+                [(key, summary, len(summary.encode("utf-8")), now) for key, summary in summaries.items()]
+            )
+            evicted = cls._evict(connection)
+        cls._count(stores=len(summaries), evictions=evicted)
+
+    @classmethod
+    def stats(cls) -> Dict[str, float]:
+        with cls._stats_lock:
+            stats = dict(cls._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    @classmethod
+    def _evict(cls, connection: sqlite3.Connection) -> int:
+        """Drop the least recently used entries once the stored summaries exceed MAX_BYTES."""
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM summary").fetchone()[0]
+        if total <= cls.MAX_BYTES:
+            return 0
+        cursor = connection.execute(
+            """
+            DELETE FROM summary WHERE cache_key IN (
+                SELECT cache_key FROM (
+                    SELECT cache_key, SUM(size) OVER (ORDER BY last_access DESC, cache_key) AS kept
+                    FROM summary
+                ) WHERE kept > ?
+            )
+            """,
+            (cls.MAX_BYTES,)
+        )
+        logger.debug(f"SummaryCache - Evicted {cursor.rowcount} summaries ({total:,} bytes over {cls.MAX_BYTES:,})")
+        return cursor.rowcount
+
+    @classmethod
+    def _count(cls, **counts: int):
+        with cls._stats_lock:
+            for name, count in counts.items():
+                cls._stats[name] += count
+
+    @classmethod
+    @contextmanager
+    def _connect(cls):
+        cls.PATH.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(cls.PATH, timeout=30)
+        if not cls._schema_ready:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS summary (
+                    cache_key   TEXT PRIMARY KEY,
+                    summary     TEXT NOT NULL,
+                    size        INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_summary_last_access ON summary(last_access);
+                """
+            )
+            cls._schema_ready = True
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
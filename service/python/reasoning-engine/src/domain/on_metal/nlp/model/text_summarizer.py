@@ -1,7 +1,19 @@
+import json
 import time
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Union
 
-from src.config.models_config import ModelsConfig
-from src.domain.on_metal.nlp.chunker.text_chunker import TextChunker
+import numpy as np
+import psutil
+import torch
+import transformers
+
+from src.config.analysis_config import AnalysisConfig
+from src.config.models_config   import ModelsConfig, GenerationProfile
+from src.domain.on_metal.nlp.chunker.text_chunker import TextChunker, guestimate_overlap_tokens
+from src.domain.on_metal.nlp.extractive.text_rank import TextRank
+from src.domain.on_metal.nlp.model.summary_cache  import SummaryCache
+from src.domain.on_metal.nlp.model.inference_executor import CancellationToken, InferenceCancelled, InferenceExecutor
+from src.domain.on_metal.nlp.tokenized_document   import TokenizedDocument
 
 from src.domain.on_metal.logger import get_logger
 logger = get_logger(__name__)
@@ -16,6 +28,11 @@ REDUCE_PROMPT = """Write a concise summary of the following summaries:
 
 CONCISE SUMMARY:"""
 
+# @todo tune per model - rough activation memory (kv cache, cross attention, ffn) per value of hidden state.
+ACTIVATIONS_PER_HIDDEN_VALUE = 4
+MEMORY_FRACTION_FOR_BATCH    = 0.25
+MAX_BATCH_SIZE               = 16
+
 # class TextSummarizerInterface(ABC):
 #     @abstractmethod
 #     async def summarize(self, text: str) -> str:
@@ -34,32 +51,71 @@ class TextSummarizer():
             self.tokenizer          = self.model_config.tokenizer
             self.device             = self.model_config.device
             self.max_chunk_length   = self.model_config.max_tokens_input_length
+            # Generate arguments, batch size and summary cache key by GenerationProfile.
+            self.generate_kwargs    = {profile: self.model_config.generation_kwargs(profile) for profile in GenerationProfile.ALL}
+            self.batch_sizes        = {profile: self._estimate_batch_size(kwargs.get("num_beams", 1)) for profile, kwargs in self.generate_kwargs.items()}
+            self.generation_keys    = {profile: self._generation_key(kwargs) for profile, kwargs in self.generate_kwargs.items()}
 
         except Exception as e:
             logger.error(f"Failed to initialize PdfSummarizer: {str(e)}", exc_info=True)
             raise
 
-    async def summarize_with_seq_to_seq(self, text_content: str, min_num_of_chunks: int = 1) -> str:
+    @staticmethod
+    def signature(profile: str = GenerationProfile.QUALITY) -> str:
+        """Identifies the model and generation settings, summaries are only comparable for equal signatures."""
+        model_config = ModelsConfig.SUMMARIZER
+        return json.dumps({
+            "model":      model_config.name,
+            "profile":    profile,
+            "generate":   model_config.generation_kwargs(profile),
+            "precision":  model_config.precision,
+            "backend":    model_config.backend,
+            "max_input":  model_config.max_tokens_input_length,
+            "max_output": model_config.max_tokens_output_length,
+            "min_output": model_config.min_tokens_output_length,
+            "params":     model_config.model_params,
+            "reduce":     [AnalysisConfig.REDUCE_FAN_IN, AnalysisConfig.REDUCE_MAX_DEPTH],
+            "extractive": AnalysisConfig.EXTRACTIVE_BUDGETS if AnalysisConfig.EXTRACTIVE_REDUCTION else None,
+        }, sort_keys=True, default=str)
+
+    async def summarize_with_seq_to_seq(self, text_content: Union[str, TokenizedDocument], min_num_of_chunks: int = 1, profile: str = GenerationProfile.QUALITY, cancellation: Optional[CancellationToken] = None, on_chunk_summary: Optional[Callable[[int, str], None]] = None) -> str:
+        """Non blocking: runs `summarize_text` on the shared inference thread, keeping the event loop free."""
+        return await InferenceExecutor.shared().run(
+            self.summarize_text, text_content, min_num_of_chunks, profile, cancellation=cancellation, on_chunk_summary=on_chunk_summary
+        )
+
+    def summarize_text(self, text_content: Union[str, TokenizedDocument], min_num_of_chunks: int = 1, profile: str = GenerationProfile.QUALITY, cancellation: Optional[CancellationToken] = None, on_chunk_summary: Optional[Callable[[int, str], None]] = None) -> str:
+        """
+        Blocking map-reduce summarization, for callers running it in their own executor. Checks `cancellation` between
+        chunks and reports every chunk summary to `on_chunk_summary(index, summary)` as soon as it is available.
+        Given a TokenizedDocument, its token ids are chunked and fed to the model without tokenizing again.
+        """
+        document     = text_content if isinstance(text_content, TokenizedDocument) else TokenizedDocument(text_content)
+        text_content = document.text
         if not text_content:
             logger.warning("Empty text to summarize provided")
             return ""
 
         try:
             start_time = time.time()
-            
-            chunks = TextChunker.token_chunks_that_fit_in_memory(
-                full_text=text_content,
+
+            if AnalysisConfig.EXTRACTIVE_REDUCTION:
+                summarized_text = TextRank.reduce(text_content, tokenizer=self.tokenizer, document=document)
+                if summarized_text is not text_content:
+                    document = TokenizedDocument(summarized_text)
+
+            records = TextChunker.iter_window_chunks(
+                document,
                 tokenizer=self.tokenizer,
-                ensure_free_kbs=5000,
-                min_num_of_chunks=1
+                max_input_tokens=self.max_chunk_length,
+                overlap_tokens=guestimate_overlap_tokens,
+                min_num_of_chunks=min_num_of_chunks
             )
-            
-            logger.info(f"Starting summarization of {len(chunks)} chunks...")
-            chunk_summaries = [self.summarize_chunk(chunk) for chunk in chunks]
 
-            filtered_summaries = [s for s in chunk_summaries if len(s.strip()) > 20]  # Filter out empty or too-short summaries
-            logger.info(f"Generating final summary from {len(filtered_summaries)} valid chunk summaries...")
-            final_summary = self.summarize_chunk(" -- ".join(filtered_summaries))
+            logger.info(f"Starting summarization ({profile} profile)...")
+            chunk_summaries = self._summarize_lazily(((record.text, record.ids) for record in records), profile, cancellation, on_chunk_summary)
+
+            final_summary = self._reduce_summaries(chunk_summaries, profile, cancellation)
 
             total_time = time.time() - start_time
             input_size = len(text_content)
@@ -70,64 +126,267 @@ class TextSummarizer():
 
             return final_summary
 
+        except InferenceCancelled:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error in summarize method: {str(e)}", exc_info=True)
             return ""
 
-    def summarize_chunk(self, chunk: str) -> str:
+    def summarize_windows(self, text_windows: List[str], profile: str = GenerationProfile.QUALITY, cancellation: Optional[CancellationToken] = None, on_chunk_summary: Optional[Callable[[int, str], None]] = None) -> List[str]:
+        """
+        Chunk summaries of a batch of windows of a text stream (e.g. converted page windows). Callers keep the
+        summaries of every batch and reduce them with `reduce_summaries` once the stream ends.
+        """
+        try:
+            if AnalysisConfig.EXTRACTIVE_REDUCTION:
+                keep_ratio   = TextRank.stream_keep_ratio()
+                text_windows = [TextRank.reduce(window, tokenizer=self.tokenizer, keep_ratio=keep_ratio) for window in text_windows]
+            chunks = TextChunker.stream_token_chunks(
+                text_windows,
+                tokenizer=self.tokenizer,
+                max_tokens=self.max_chunk_length - self.tokenizer.num_special_tokens_to_add(),
+                overlap_tokens=guestimate_overlap_tokens
+            )
+            return self._summarize_lazily(((chunk, None) for chunk in chunks), profile, cancellation, on_chunk_summary)
+
+        except InferenceCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error in summarize windows method: {str(e)}", exc_info=True)
+            return []
+
+    def reduce_summaries(self, chunk_summaries: List[str], profile: str = GenerationProfile.QUALITY, cancellation: Optional[CancellationToken] = None) -> str:
+        """Final summary of the chunk summaries collected from `summarize_windows`."""
+        try:
+            if not chunk_summaries:
+                logger.warning("Empty text stream to summarize provided")
+                return ""
+            start_time    = time.time()
+            final_summary = self._reduce_summaries(chunk_summaries, profile, cancellation)
+            logger.info(f"Streamed text summarization reduced {len(chunk_summaries)} chunk summaries to {len(final_summary):,} chars in {time.time() - start_time:.2f}s")
+            return final_summary
+
+        except InferenceCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error in reduce summaries method: {str(e)}", exc_info=True)
+            return ""
+
+    def _summarize_lazily(self, chunks: Iterable[Tuple[str, Optional[np.ndarray]]], profile: str, cancellation: Optional[CancellationToken] = None, on_chunk_summary: Optional[Callable[[int, str], None]] = None) -> List[str]:
+        """
+        Summaries of (text, token ids or None) chunks pulled one batch at a time, so generation starts as soon as
+        the first batch is chunked and only one batch of chunks is held.
+        """
+        summaries, batch, batch_ids = [], [], []
+        for text, ids in chunks:
+            if cancellation is not None:
+                cancellation.raise_if_cancelled()
+            batch.append(text)
+            batch_ids.append(ids)
+            if len(batch) == self.batch_sizes[profile]:
+                summaries += self.summarize_chunks(batch, profile, cancellation, self._offset(on_chunk_summary, len(summaries)), chunk_ids=batch_ids if batch_ids[0] is not None else None)
+                batch, batch_ids = [], []
+        if batch:
+            summaries += self.summarize_chunks(batch, profile, cancellation, self._offset(on_chunk_summary, len(summaries)), chunk_ids=batch_ids if batch_ids[0] is not None else None)
+        return summaries
+
+    def _reduce_summaries(self, chunk_summaries: List[str], profile: str = GenerationProfile.QUALITY, cancellation: Optional[CancellationToken] = None) -> str:
+        """
+        Tree reduce: join summaries in groups that fit the model window (at most `REDUCE_FAN_IN` each),
+        summarize every group of a level in batches, and repeat until the joined summaries fit one window.
+        """
+        summaries = [s for s in chunk_summaries if len(s.strip()) > 20]  # Filter out empty or too-short summaries
+        logger.info(f"Generating final summary from {len(summaries)} valid chunk summaries...")
+        if not summaries:
+            return ""
+
+        separator        = " -- "
+        separator_tokens = len(self.tokenizer.encode(separator, add_special_tokens=False))
+        window_tokens    = self.max_chunk_length - self.tokenizer.num_special_tokens_to_add()
+        fan_in           = max(2, AnalysisConfig.REDUCE_FAN_IN)
+
+        depth = 0
+        while len(summaries) > 1:
+            lengths = [len(ids) for ids in self.tokenizer(summaries, add_special_tokens=False)["input_ids"]]
+            if sum(lengths) + separator_tokens * (len(summaries) - 1) <= window_tokens:
+                break
+            if depth >= AnalysisConfig.REDUCE_MAX_DEPTH:
+                logger.warning(f"Reduce depth limit {AnalysisConfig.REDUCE_MAX_DEPTH} reached with {len(summaries)} summaries, the final summary input gets truncated.")
+                break
+
+            groups = self._group_for_window(summaries, lengths, window_tokens, separator_tokens, fan_in)
+            level_start = time.time()
+            summaries = [s for s in self.summarize_chunks([separator.join(group) for group in groups], profile, cancellation) if s.strip()]
+            depth += 1
+            logger.debug(f"Reduce level {depth}: {len(groups)} groups summarized in {time.time() - level_start:.2f}s")
+            if not summaries:
+                return ""
+
+        return self.summarize_chunks([separator.join(summaries)], profile, cancellation)[0]
+
+    @staticmethod
+    def _group_for_window(summaries: List[str], lengths: List[int], window_tokens: int, separator_tokens: int, fan_in: int) -> List[List[str]]:
+        """Greedy, order preserving grouping of consecutive summaries; a group is never empty."""
+        groups, group, group_tokens = [], [], 0
+        for summary, num_tokens in zip(summaries, lengths):
+            needed = num_tokens + (separator_tokens if group else 0)
+            if group and (len(group) == fan_in or group_tokens + needed > window_tokens):
+                groups.append(group)
+                group, group_tokens, needed = [], 0, num_tokens
+            group.append(summary)
+            group_tokens += needed
+        if group:
+            groups.append(group)
+        return groups
+
+    def summarize_chunk(self, chunk: str, profile: str = GenerationProfile.QUALITY) -> str:
+        return self.summarize_chunks([chunk], profile)[0]
+
+    def summarize_chunks(self, chunks: List[str], profile: str = GenerationProfile.QUALITY, cancellation: Optional[CancellationToken] = None, on_chunk_summary: Optional[Callable[[int, str], None]] = None, chunk_ids: Optional[Sequence[np.ndarray]] = None) -> List[str]:
+        """
+        Summarize chunks in padded batches of the profile batch size, one generate call per batch. Keeps input order.
+        Chunks already summarized with the same generation settings come from the summary cache.
+        `chunk_ids`, the token ids of the chunks (without special tokens), skips their tokenization.
+        """
+        if not chunks:
+            return []
+
+        summaries = [""] * len(chunks)
+        cached    = {}
+        keys      = []
+        if AnalysisConfig.SUMMARY_CACHE:
+            keys   = [SummaryCache.cache_key(chunk, self.generation_keys[profile]) for chunk in chunks]
+            cached = SummaryCache.get_many(keys)
+            for i, key in enumerate(keys):
+                if key in cached:
+                    summaries[i] = cached[key]
+                    if on_chunk_summary is not None:
+                        on_chunk_summary(i, summaries[i])
+        pending = [i for i in range(len(chunks)) if not keys or keys[i] not in cached]
+
+        # Similar lengths in the same batch means less padding.
+        order      = sorted(pending, key=lambda i: len(chunks[i]))
+        batch_size = self.batch_sizes[profile]
+        for start in range(0, len(order), batch_size):
+            if cancellation is not None:
+                cancellation.raise_if_cancelled()
+            batch_indexes = order[start:start + batch_size]
+            batch_ids       = [chunk_ids[i] for i in batch_indexes] if chunk_ids is not None else None
+            batch_summaries = self._summarize_batch([chunks[i] for i in batch_indexes], profile, batch_ids)
+            for i, summary in zip(batch_indexes, batch_summaries):
+                summaries[i] = summary
+                if on_chunk_summary is not None:
+                    on_chunk_summary(i, summary)
+            if keys:
+                # Failed generations come back empty and are not cached.
+                SummaryCache.put_many({keys[i]: summary for i, summary in zip(batch_indexes, batch_summaries) if summary})
+
+        if keys:
+            logger.debug(f"Summary cache: {len(chunks) - len(pending)}/{len(chunks)} chunks cached, totals {SummaryCache.stats()}")
+        return summaries
+
+    @staticmethod
+    def _offset(on_chunk_summary: Optional[Callable[[int, str], None]], offset: int):
+        if on_chunk_summary is None:
+            return None
+        return lambda index, summary: on_chunk_summary(offset + index, summary)
+
+    def _summarize_batch(self, batch: List[str], profile: str, batch_ids: Optional[Sequence[np.ndarray]] = None) -> List[str]:
         try:
             start_time = time.time()
-            chunk_size = len(chunk)
-            logger.debug(f"Starting chunk summarization (size: {chunk_size} chars)")
+            batch_size_chars = sum(len(chunk) for chunk in batch)
+            logger.debug(f"Starting batch summarization of {len(batch)} chunks (size: {batch_size_chars} chars)")
             logger.debug(f"Model has max_tokens_input_length of {self.model_config.max_tokens_input_length} tokens.")
 
             # Tokenization phase
             tok_start = time.time()
-            inputs = self.tokenizer(
-                chunk,
-                max_length=self.model_config.max_tokens_input_length,
-                truncation=True,
-                padding=True,
-                return_tensors="pt"
-            ).to(self.device)
+            if batch_ids is not None:
+                inputs = self.tokenizer.pad(
+                    {"input_ids": [self.tokenizer.build_inputs_with_special_tokens(ids.tolist()) for ids in batch_ids]},
+                    padding=True,
+                    return_tensors="pt"
+                ).to(self.device)
+            else:
+                inputs = self.tokenizer(
+                    batch,
+                    max_length=self.model_config.max_tokens_input_length,
+                    truncation=True,
+                    padding=True,
+                    return_tensors="pt"
+                ).to(self.device)
             tok_time = time.time() - tok_start
-            num_tokens = len(inputs['input_ids'][0])
-            logger.debug(f"Tokenization completed: {num_tokens} tokens in {tok_time:.2f}s")
+            num_tokens = int(inputs['attention_mask'].sum())
+            logger.debug(f"Tokenization completed: {num_tokens} tokens ({inputs['input_ids'].shape[1]} padded per chunk) in {tok_time:.2f}s")
 
             # Generation phase
             gen_start = time.time()
-            outputs = self.model.generate(
-                **inputs,
-                max_length=self.model_config.max_tokens_output_length,
-                min_length=self.model_config.min_tokens_output_length,
-                num_return_sequences=1,
-                num_beams=4,
-                early_stopping=True
-            )
+            outputs = self.model.generate(**inputs, **self.generate_kwargs[profile])
             gen_time = time.time() - gen_start
             logger.debug(f"Summary generation completed in {gen_time:.2f}s")
 
             # Decoding phase
             dec_start = time.time()
-            summary = self.tokenizer.decode(
-                outputs[0],
+            summaries = self.tokenizer.batch_decode(
+                outputs,
                 skip_special_tokens=True,
                 clean_up_tokenization_spaces=True
             )
             dec_time = time.time() - dec_start
-            
+
             # Final stats
             total_time = time.time() - start_time
-            summary_size = len(summary)
-            compression_ratio = (chunk_size - summary_size) / chunk_size * 100
-            
-            logger.debug(f"Chunk summarized: {chunk_size:,} chars → {summary_size:,} chars >> {compression_ratio:.1f}% reduction) in {total_time:.2f}s >> Times: tokenize={tok_time:.2f}s, generate={gen_time:.2f}s, decode={dec_time:.2f}s")
-            logger.debug(f"Chunk Summary: {summary.strip()}")
-            return summary.strip()
-            
+            for chunk, summary in zip(batch, summaries):
+                chunk_size = len(chunk)
+                summary_size = len(summary)
+                compression_ratio = (chunk_size - summary_size) / chunk_size * 100 if chunk_size else 0.0
+                logger.debug(f"Chunk summarized: {chunk_size:,} chars → {summary_size:,} chars >> {compression_ratio:.1f}% reduction)")
+                logger.debug(f"Chunk Summary: {summary.strip()}")
+            logger.debug(f"Batch of {len(batch)} chunks summarized in {total_time:.2f}s ({total_time / len(batch):.2f}s per chunk) >> Times: tokenize={tok_time:.2f}s, generate={gen_time:.2f}s, decode={dec_time:.2f}s")
+            return [summary.strip() for summary in summaries]
+
         except Exception as e:
-            logger.error(f"Error summarizing chunk: {str(e)}")
-            return ""
+            logger.error(f"Error summarizing batch of {len(batch)} chunks: {str(e)}")
+            return [""] * len(batch)
+
+    def _generation_key(self, generate_kwargs: dict) -> str:
+        """Everything that changes the summary of a given chunk: model weights, dtype and generate arguments."""
+        config = self.model.config
+        return json.dumps({
+            "model":        self.model_config.name,
+            "revision":     getattr(config, "_commit_hash", None) or getattr(config, "transformers_version", None),
+            "transformers": transformers.__version__,
+            "precision":    self.model_config.precision,
+            "backend":      self.model_config.backend,
+            "dtype":        str(getattr(self.model, "dtype", "")),
+            "max_input":    self.model_config.max_tokens_input_length,
+            "generation":   self.model.generation_config.to_diff_dict() if hasattr(self.model, "generation_config") else None,
+            "generate":     generate_kwargs,
+        }, sort_keys=True, default=str)
 
+    def _estimate_batch_size(self, num_beams: int) -> int:
+        """
+        Chunks per generate call from the model footprint: activation memory of one full length input
+        across all beams, against a fraction of the memory available on the model device.
+        """
+        try:
+            if self.device.type == "cuda":
+                available_bytes = torch.cuda.mem_get_info(self.device)[0]
+            else:
+                # CPU and MPS (unified memory) share the system RAM.
+                available_bytes = psutil.virtual_memory().available
+
+            config          = self.model.config
+            hidden_size     = getattr(config, "d_model", None) or getattr(config, "hidden_size", 1024)
+            num_layers      = (getattr(config, "encoder_layers", 0) + getattr(config, "decoder_layers", 0)) or getattr(config, "num_hidden_layers", 12)
+            # ONNX Runtime models expose no torch parameters, their weights are fp32.
+            bytes_per_value = next(self.model.parameters()).element_size() if hasattr(self.model, "parameters") else 4
+            bytes_per_chunk = num_beams * self.max_chunk_length * hidden_size * num_layers * bytes_per_value * ACTIVATIONS_PER_HIDDEN_VALUE
 
+            batch_size = int(available_bytes * MEMORY_FRACTION_FOR_BATCH // bytes_per_chunk)
+            batch_size = max(1, min(MAX_BATCH_SIZE, batch_size))
+            logger.debug(f"TextSummarizer - {num_beams} beams, {bytes_per_chunk / 1024 ** 2:.0f}MB per chunk, {available_bytes / 1024 ** 3:.1f}GB available: batch size {batch_size}")
+            return batch_size
 
+        except Exception as e:
+            logger.warning(f"Could not estimate summarization batch size, using 1: {str(e)}")
+            return 1
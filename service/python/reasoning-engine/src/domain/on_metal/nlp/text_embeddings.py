@@ -1,23 +1,51 @@
+import os
 import string
+import threading
 from sentence_transformers import SentenceTransformer
 
+from src.config.models_config import ModelsConfig, Backend
+
 
 # @todo move this model management to model config files and system - is the key text embeddings for pdf text as of today.
-default_model_name  = "sentence-transformers/all-MiniLM-L6-v2"
+default_model_name  = ModelsConfig.EMBEDDINGS.name
 
 
 
 class TextEmbeddings:
+    _models = {}
+    _lock   = threading.Lock()
+
     @staticmethod
     def embed(text: string, model_name: string =None):
         if text is None: raise Exception("Text cannot be None")
-        if model_name is not None:
-            model = SentenceTransformer(model_name)
-        else:
-            model = SentenceTransformer(default_model_name)
+        model = TextEmbeddings._get_model(model_name or default_model_name)
 
         embeddings = model.encode(text)
         return embeddings
 
+    @staticmethod
+    def _get_model(model_name: str) -> SentenceTransformer:
+        """One loaded model per name, on the backend configured in ModelsConfig.EMBEDDINGS."""
+        with TextEmbeddings._lock:
+            model = TextEmbeddings._models.get(model_name)
+            if model is None:
+                model = TextEmbeddings._load_model(model_name)
+                TextEmbeddings._models[model_name] = model
+            return model
 
-
+    @staticmethod
+    def _load_model(model_name: str) -> SentenceTransformer:
+        model_config = ModelsConfig.EMBEDDINGS
+        if model_config.backend != Backend.ONNX:
+            return SentenceTransformer(model_name)
+
+        # Export once into the models directory, later loads read the exported graph.
+        onnx_path = model_config.onnx_path if model_name == model_config.name else None
+        if onnx_path is not None and onnx_path.exists():
+            return SentenceTransformer(str(onnx_path), backend=Backend.ONNX, device="cpu")
+        model = SentenceTransformer(model_name, backend=Backend.ONNX, device="cpu")
+        if onnx_path is not None:
+            temp_path = onnx_path.with_name(f".{onnx_path.name}.tmp")
+            model.save_pretrained(str(temp_path))
+            os.replace(temp_path, onnx_path)
+        return model
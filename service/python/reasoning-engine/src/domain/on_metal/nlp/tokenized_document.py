@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing  import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.domain.on_metal.logger import get_logger
+logger = get_logger(__name__)
+
+
+class TokenizedDocument:
+    """
+    A text and its tokenization, memoized per tokenizer: the token ids (int32) and the (start, end) character
+    offsets of every token, from a single fast tokenizer pass. Chunkers, the summarizer and extractive reduction
+    share it instead of tokenizing the same document again, and it can be persisted next to the converted
+    markdown so that re-analyzing with other chunk or generation settings skips tokenization entirely.
+    """
+    def __init__(self, text: str):
+        self.text    = text
+        self._tokens: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lock   = threading.Lock()
+        self._hash: Optional[str] = None
+        # Tokenizations added since the document was created or loaded, i.e. worth saving.
+        self.is_dirty = False
+
+    @property
+    def text_hash(self) -> str:
+        if self._hash is None:
+            self._hash = hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+        return self._hash
+
+    @staticmethod
+    def tokenizer_key(tokenizer) -> str:
+        """Tokenizers with the same class, source and vocabulary size tokenize a text the same way."""
+        return f"{type(tokenizer).__name__}:{getattr(tokenizer, 'name_or_path', '')}:{len(tokenizer)}"
+
+    def ids(self, tokenizer) -> np.ndarray:
+        return self._tokenization(tokenizer)[0]
+
+    def offsets(self, tokenizer) -> np.ndarray:
+        """(num_tokens, 2) array of character offsets of the tokens in `text`."""
+        return self._tokenization(tokenizer)[1]
+
+    def num_tokens(self, tokenizer) -> int:
+        return len(self.ids(tokenizer))
+
+    def span_text(self, tokenizer, start: int, end: int) -> str:
+        """Original text of the tokens [start, end)."""
+        if end <= start:
+            return ""
+        offsets = self.offsets(tokenizer)
+        return self.text[int(offsets[start][0]):int(offsets[end - 1][1])]
+
+    def _tokenization(self, tokenizer) -> Tuple[np.ndarray, np.ndarray]:
+        key = self.tokenizer_key(tokenizer)
+        with self._lock:
+            tokenization = self._tokens.get(key)
+            if tokenization is None:
+                tokenization = self._tokenize(tokenizer)
+                self._tokens[key] = tokenization
+                self.is_dirty = True
+            return tokenization
+
+    def _tokenize(self, tokenizer) -> Tuple[np.ndarray, np.ndarray]:
+        if not getattr(tokenizer, "is_fast", False):
+            raise ValueError("TokenizedDocument needs a fast (Rust backed) tokenizer for the token offsets.")
+        encoding = tokenizer(self.text, add_special_tokens=False, return_offsets_mapping=True, return_attention_mask=False)
+        ids      = np.asarray(encoding["input_ids"], dtype=np.int32)
+        offsets  = np.asarray(encoding["offset_mapping"], dtype=np.int32).reshape(-1, 2)
+        logger.debug(f"TokenizedDocument - {len(self.text):,} chars into {len(ids):,} tokens ({type(tokenizer).__name__})")
+        return ids, offsets
+
+    def save(self, path: Path):
+        """Write every tokenization to `path` (npz), swapped in atomically."""
+        with self._lock:
+            keys   = sorted(self._tokens)
+            arrays = {}
+            for i, key in enumerate(keys):
+                arrays[f"ids_{i}"], arrays[f"offsets_{i}"] = self._tokens[key]
+            arrays["meta"] = np.asarray(json.dumps({"text_hash": self.text_hash, "tokenizers": keys}))
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(f".{path.name}.tmp")
+            with temp_path.open("wb") as fp:
+                np.savez(fp, **arrays)
+            os.replace(temp_path, path)
+            self.is_dirty = False
+        logger.debug(f"TokenizedDocument - Saved {len(keys)} tokenizations to {path}")
+
+    @classmethod
+    def load(cls, text: str, path: Path) -> "TokenizedDocument":
+        """Document of `text` with the tokenizations saved at `path`, if they were made for this very text."""
+        document = cls(text)
+        if not path.exists():
+            return document
+        try:
+            with np.load(path, allow_pickle=False) as arrays:
+                meta = json.loads(str(arrays["meta"]))
+                if meta["text_hash"] != document.text_hash:
+                    logger.debug(f"TokenizedDocument - Ignoring {path}, it was saved for another text")
+                    return document
+                for i, key in enumerate(meta["tokenizers"]):
+                    document._tokens[key] = (arrays[f"ids_{i}"], arrays[f"offsets_{i}"])
+        except Exception as e:
+            logger.warning(f"TokenizedDocument - Could not load {path}, tokenizing again: {str(e)}")
+            document._tokens = {}
+        return document
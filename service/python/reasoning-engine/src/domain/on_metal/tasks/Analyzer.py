@@ -1,43 +1,93 @@
+import asyncio
+import os
+
+from src.config.analysis_config                    import AnalysisConfig
+from src.config.models_config                      import GenerationProfile
 from src.service.database.chroma.models.hnode      import HnodeCollection
 from src.service.database.sqlite.models.hnode      import HNode
 from src.domain.on_metal.file.pdf                  import PdfFile, PdfAnalysisResults
 from src.domain.on_metal.nlp.model.text_summarizer import TextSummarizer
+from src.domain.on_metal.nlp.model.inference_executor import InferenceExecutor
+from src.domain.on_metal.tasks.analysis_pipeline   import AnalysisPipeline
+from src.domain.on_metal.tasks.analysis_events     import AnalysisEvent, AnalysisEvents
 
 from src.domain.on_metal.logger import get_logger
 logger = get_logger(__name__)
 
 class Analyzer:
     @staticmethod
-    async def analyze_file(hnode: HNode) -> PdfAnalysisResults | None:  # @todo add interface for results of any file type instead of None.
+    async def analyze_file(hnode: HNode, pipeline: AnalysisPipeline = None, priority: int = 0, events: AnalysisEvents = None, with_chunks: bool = False) -> PdfAnalysisResults | None:  # @todo add interface for results of any file type instead of None.
         file_ext = hnode.fs_file_extension.strip().lower()
-        if file_ext == "pdf":
+        profile  = Analyzer.generation_profile(hnode, priority)
+        if file_ext == "pdf" and pipeline is not None:
+            logger.info(f"> Queue Analysis task for {hnode.fs_full_path} on the analysis pipeline ({profile} profile)")
+            data = await pipeline.submit(hnode, profile=profile, events=events, with_chunks=with_chunks)
+            return PdfAnalysisResults(
+                metadata                = data["metadata"] or {},
+                summary                 = data["summary"] or "",
+                structure               = {},
+                images                  = [{}],
+                semantic_chunks         = data["semantic_chunks"],
+                naive_chunks            = [{}],
+                overlapped_fixed_chunks = [{}]
+            )
+        elif file_ext == "pdf":
             result = PdfAnalysisResults(
                 metadata                = {},
                 summary                 = "",
                 structure               = {},
                 images                  = [{}],
-                semantic_chunks         = [{}],
+                semantic_chunks         = [],
                 naive_chunks            = [{}],
                 overlapped_fixed_chunks = [{}]
             )
             # @hack below to test quicker @todo remove
             # pdf_as_md         = PdfAnalyzer.transform_to_md(hnode.fs_full_path)
             logger.info(f"> Start Analysis task for {hnode.fs_full_path}")
-            pdf_as_md           = PdfFile.get_md_from_file(hnode.fs_full_path)
+            # Blocking steps run off the event loop so the API stays responsive.
+            pdf_as_md           = await asyncio.to_thread(PdfFile.get_md_from_file, hnode.fs_full_path)
+            pdf_metadata        = await asyncio.to_thread(PdfFile.extract_metadata, hnode.fs_full_path)
+            on_chunk_summary    = None
+            if events is not None:
+                events.emit(AnalysisEvent.METADATA, {"metadata": pdf_metadata})
+                on_chunk_summary = lambda index, summary: events.emit(AnalysisEvent.CHUNK_SUMMARY, {"index": index, "summary": summary})
 
-            text_summarizer     = TextSummarizer()
-            pdf_summary_s2s     = await text_summarizer.summarize_with_seq_to_seq(pdf_as_md)
-            pdf_metadata        = PdfFile.extract_metadata(hnode.fs_full_path)
+            text_summarizer     = await InferenceExecutor.shared().run(TextSummarizer)
+            pdf_summary_s2s     = await text_summarizer.summarize_with_seq_to_seq(
+                pdf_as_md, profile=profile, cancellation=AnalysisPipeline.cancellation_for(hnode), on_chunk_summary=on_chunk_summary
+            )
+            if events is not None:
+                events.emit(AnalysisEvent.SUMMARY, {"summary": pdf_summary_s2s})
+            result.metadata        = pdf_metadata
+            result.summary         = pdf_summary_s2s
+            if with_chunks:
+                result.semantic_chunks = await asyncio.to_thread(AnalysisPipeline.semantic_chunks, hnode.fs_full_path, text_summarizer.tokenizer)
 
             data = {
                 "summary":  pdf_summary_s2s,
                 "metadata": pdf_metadata,
             }
+            await asyncio.to_thread(HnodeCollection.upsert_hnode_by_id, hnode.id, data)
+            return result
 
-            logger.info(data)
-            logger.info(type(data))
-            HnodeCollection.upsert_hnode_by_id(hnode.id, data)
 
+    @staticmethod
+    def generation_profile(hnode: HNode, priority: int = 0) -> str:
+        """Interactive (prioritized) tasks keep beam search quality, background indexing of big files goes greedy."""
+        if AnalysisConfig.GENERATION_PROFILE:
+            return AnalysisConfig.GENERATION_PROFILE
+        if priority >= AnalysisConfig.PROFILE_QUALITY_MIN_PRIORITY:
+            return GenerationProfile.QUALITY
+
+        file_size = getattr(hnode, "fs_file_size", None)
+        if file_size is None:
+            try:
+                file_size = os.path.getsize(hnode.fs_full_path)
+            except OSError:
+                file_size = 0
+        if file_size >= AnalysisConfig.PROFILE_FAST_MIN_MB * 1024 * 1024:
+            return GenerationProfile.FAST
+        return GenerationProfile.BALANCED
 
     @staticmethod
     def analyze_folder(hnode: HNode):
@@ -0,0 +1,41 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+
+class AnalysisEvent:
+    METADATA      = "metadata"
+    CHUNK_SUMMARY = "chunk_summary"
+    SUMMARY       = "summary"
+    DONE          = "done"
+    ERROR         = "error"
+
+
+_CLOSED = object()
+
+
+class AnalysisEvents:
+    """
+    Partial results of one document analysis, emitted from any thread (pipeline stages, the inference thread)
+    and consumed on the event loop as an async iterator, e.g. to stream them as Server-Sent Events.
+    """
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self._loop  = loop or asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+    def emit(self, event: str, data: Dict[str, Any]):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (event, data))
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, _CLOSED)
+
+    async def __aiter__(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        while True:
+            item = await self._queue.get()
+            if item is _CLOSED:
+                return
+            yield item
+
+    @staticmethod
+    def to_sse(event: str, data: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,493 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses        import dataclass, field
+from pathlib            import Path
+from typing             import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from src.config.analysis_config                    import AnalysisConfig
+from src.config.workers_config                     import WorkersConfig
+from src.config.models_config                      import GenerationProfile, ModelsConfig
+from src.service.database.sqlite.analysis_state    import AnalysisState, AnalysisStateRepository
+from src.service.database.chroma.models.hnode      import HnodeCollection
+from src.domain.on_metal.file.pdf                  import PdfFile
+from src.domain.on_metal.file.conversion_pool      import ConversionPool
+from src.domain.on_metal.file.conversion_cache     import ConversionCache
+from src.domain.on_metal.file.fingerprint          import FileFingerprint
+from src.domain.on_metal.nlp.model.text_summarizer import TextSummarizer
+from src.domain.on_metal.nlp.model.inference_executor import CancellationToken, InferenceExecutor
+from src.domain.on_metal.nlp.tokenized_document    import TokenizedDocument
+from src.domain.on_metal.nlp.chunker.structure_chunker import StructureChunker
+from src.domain.on_metal.tasks.worker_pool         import WorkerPool
+from src.domain.on_metal.tasks.analysis_events     import AnalysisEvent, AnalysisEvents
+
+from src.domain.on_metal.logger import get_logger
+logger = get_logger(__name__)
+
+# End of the page windows of a streamed pdf, and how often the token is checked while waiting for one.
+_END_OF_WINDOWS      = object()
+_WINDOW_POLL_SECONDS = 1.0
+
+
+@dataclass
+class PipelineItem:
+    hnode:      Any
+    result:     asyncio.Future
+    markdown:   Optional[str]            = None
+    summary:    Optional[str]            = None
+    metadata:   Optional[Dict[str, Any]] = None
+    started_at: float                    = field(default_factory=time.time)
+    profile:    str                      = GenerationProfile.QUALITY
+    # Large pdfs are not converted upfront, the summarize stage streams them page window by page window.
+    stream:     bool                     = False
+    # Incremental analysis: current fingerprint, last analysis and the stages that can be skipped.
+    fingerprint:   Optional[FileFingerprint] = None
+    markdown_hash: Optional[str]             = None
+    previous:      Optional[AnalysisState]   = None
+    skip_stages:   Set[str]                  = field(default_factory=set)
+    # Per document deadline, revocation and file deletion, checked between stages and between chunks.
+    cancellation:  Optional[CancellationToken] = None
+    # Partial results (metadata, chunk summaries, summary) for callers streaming them.
+    events:        Optional[AnalysisEvents]    = None
+    # Tokenization of the markdown, shared by the stages and persisted in the conversion cache.
+    tokens:        Optional[TokenizedDocument] = None
+    # Structure aligned chunks of the docling document, with their section path and pages, only when asked for.
+    with_chunks:     bool                           = False
+    semantic_chunks: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return {
+            "summary":  self.summary,
+            "metadata": self.metadata,
+        }
+
+    @property
+    def results(self) -> Dict[str, Any]:
+        return {
+            **self.data,
+            "semantic_chunks": self.semantic_chunks or [],
+        }
+
+
+@dataclass
+class PipelineStage:
+    name:        str
+    run:         Callable[[PipelineItem], Awaitable[None]]
+    concurrency: int
+    queue:       asyncio.Queue
+    # Separate consumers for streamed items, so waiting on the conversion of a large pdf does not hold the stage.
+    stream_lane: Optional["PipelineStage"] = None
+
+
+class AnalysisPipeline:
+    """
+    Pdf analysis split in stages: convert -> metadata -> summarize -> store.
+    Each stage runs on its own executor and stages are linked by bounded queues, so documents flow
+    through concurrently and a slow stage applies backpressure on the previous ones.
+    """
+    def __init__(
+        self,
+        worker_pool: WorkerPool,
+        conversion_pool: ConversionPool,
+        queue_size: int = WorkersConfig.PIPELINE_QUEUE_SIZE,
+        incremental: bool = AnalysisConfig.INCREMENTAL,
+    ):
+        self._worker_pool        = worker_pool
+        self._conversion_pool    = conversion_pool
+        self._queue_size         = queue_size
+        self._incremental        = incremental
+        self._summary_signatures = {profile: TextSummarizer.signature(profile) for profile in GenerationProfile.ALL}
+        self._convert_executor   = None
+        self._inference          = None
+        self._store_executor     = None
+        self._summarizer: Optional[TextSummarizer] = None
+        self._stages: List[PipelineStage]          = []
+        self._consumers: List[asyncio.Task]        = []
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._consumers)
+
+    async def start(self):
+        if self.is_running:
+            return
+        # Summarization and vector store writes are single threaded: one model instance, one chroma client.
+        # The inference thread is the process wide one, shared with analyses running outside the pipeline.
+        self._convert_executor   = ThreadPoolExecutor(max_workers=WorkersConfig.PIPELINE_CONVERT_WORKERS, thread_name_prefix="pipeline-convert")
+        self._inference          = InferenceExecutor.shared()
+        self._store_executor     = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-store")
+
+        self._stages = [
+            PipelineStage("convert",   self._convert,          WorkersConfig.PIPELINE_CONVERT_WORKERS, asyncio.Queue(self._queue_size)),
+            # Metadata is cheap, it goes before the summary so it can be reported while the summary is generated.
+            PipelineStage("metadata",  self._extract_metadata, WorkersConfig.NUM_PROCESS_WORKERS,      asyncio.Queue(self._queue_size)),
+            PipelineStage("summarize", self._summarize,        1,                                      asyncio.Queue(self._queue_size),
+                          stream_lane=PipelineStage("summarize", self._summarize, WorkersConfig.PIPELINE_STREAM_LANES, asyncio.Queue(self._queue_size))),
+            PipelineStage("store",     self._store,            1,                                      asyncio.Queue(self._queue_size)),
+        ]
+        for index, stage in enumerate(self._stages):
+            next_stage = self._stages[index + 1] if index + 1 < len(self._stages) else None
+            self._consumers += [
+                asyncio.create_task(self._consume(stage, next_stage), name=f"pipeline-{stage.name}-{n}")
+                for n in range(stage.concurrency)
+            ]
+            if stage.stream_lane is not None:
+                self._consumers += [
+                    asyncio.create_task(self._consume(stage.stream_lane, next_stage), name=f"pipeline-{stage.name}-stream-{n}")
+                    for n in range(stage.stream_lane.concurrency)
+                ]
+        logger.info(f"> Analysis pipeline started with stages: {', '.join(stage.name for stage in self._stages)}")
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        for consumer in self._consumers:
+            consumer.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers = []
+        for executor in (self._convert_executor, self._store_executor):
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, hnode, profile: str = GenerationProfile.QUALITY, events: Optional[AnalysisEvents] = None, with_chunks: bool = False) -> Dict[str, Any]:
+        """Feed a pdf hyper_node into the pipeline and wait until it went through every stage."""
+        if not self.is_running:
+            raise RuntimeError("Analysis pipeline is not running.")
+        item = PipelineItem(
+            hnode=hnode,
+            result=asyncio.get_running_loop().create_future(),
+            profile=profile,
+            # The deadline starts in the summarize stage, the time queued behind other documents does not count.
+            cancellation=self.cancellation_for(hnode, started=False),
+            events=events,
+            with_chunks=with_chunks,
+        )
+        try:
+            await self._stages[0].queue.put(item)
+            return await item.result
+        except asyncio.CancelledError:
+            # The task was revoked: the remaining stages are skipped and a running summarization stops.
+            item.cancellation.cancel("task cancelled")
+            raise
+
+    @staticmethod
+    def cancellation_for(hnode, started: bool = True) -> CancellationToken:
+        """Deadline growing with the file size; the analysis also stops once the file is deleted."""
+        path = hnode.fs_full_path
+        try:
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+        except OSError:
+            size_mb = 0
+        timeout = AnalysisConfig.DOCUMENT_TIMEOUT_SECONDS + AnalysisConfig.DOCUMENT_TIMEOUT_SECONDS_PER_MB * size_mb
+        return CancellationToken(timeout_seconds=timeout, is_valid=lambda: os.path.exists(path), started=started)
+
+    async def _consume(self, stage: PipelineStage, next_stage: Optional[PipelineStage]):
+        while True:
+            item = await stage.queue.get()
+            try:
+                if item.cancellation is not None:
+                    item.cancellation.raise_if_cancelled()
+                if stage.name not in item.skip_stages:
+                    stage_start = time.time()
+                    await stage.run(item)
+                    logger.debug(f"Pipeline - {stage.name} done for {item.hnode.fs_full_path} in {time.time() - stage_start:.2f}s")
+                if item.events is not None:
+                    self._emit_stage_result(item, stage.name)
+            except asyncio.CancelledError:
+                if not item.result.done():
+                    item.result.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Pipeline - {stage.name} failed for {item.hnode.fs_full_path}: {str(e)}", exc_info=True)
+                if not item.result.done():
+                    item.result.set_exception(e)
+                continue
+            finally:
+                stage.queue.task_done()
+
+            if next_stage is not None:
+                await self._queue_for(item, next_stage).put(item)
+            elif not item.result.done():
+                logger.info(f"> Analysis done for {item.hnode.fs_full_path} in {time.time() - item.started_at:.2f}s")
+                item.result.set_result(item.results)
+
+    @staticmethod
+    def _queue_for(item: PipelineItem, stage: PipelineStage) -> asyncio.Queue:
+        if item.stream and stage.stream_lane is not None and stage.name not in item.skip_stages:
+            return stage.stream_lane.queue
+        return stage.queue
+
+    @staticmethod
+    def _emit_stage_result(item: PipelineItem, stage_name: str):
+        """Report a stage output as soon as it is known, reused or computed."""
+        if stage_name == "metadata":
+            item.events.emit(AnalysisEvent.METADATA, {"metadata": item.metadata})
+        elif stage_name == "summarize":
+            item.events.emit(AnalysisEvent.SUMMARY, {"summary": item.summary})
+
+    async def _convert(self, item: PipelineItem):
+        loop = asyncio.get_running_loop()
+        path = item.hnode.fs_full_path
+        if self._incremental:
+            item.fingerprint = await loop.run_in_executor(
+                self._convert_executor, FileFingerprint.from_path, path, AnalysisConfig.FINGERPRINT_SAMPLED_HASH
+            )
+            item.previous = await loop.run_in_executor(self._convert_executor, AnalysisStateRepository.get, item.hnode.id)
+            if self._is_unchanged(item):
+                logger.info(f"> Skipping unchanged {path}, analyzed at {item.previous.analyzed_at}")
+                item.summary     = item.previous.summary
+                item.metadata    = item.previous.metadata
+                item.skip_stages = {"metadata", "summarize", "store"}
+                if item.with_chunks:
+                    item.semantic_chunks = await loop.run_in_executor(
+                        self._convert_executor, self.semantic_chunks, path, ModelsConfig.SUMMARIZER.tokenizer
+                    )
+                return
+
+        item.markdown = await loop.run_in_executor(self._convert_executor, PdfFile.get_md_from_file, path)
+        num_pages = 0
+        if item.markdown is None:
+            num_pages   = await loop.run_in_executor(self._convert_executor, PdfFile.count_pages, path)
+            item.stream = num_pages > AnalysisConfig.STREAMING_MIN_PAGES
+
+        exports = {}
+        if item.markdown is None and not item.stream:
+            if num_pages > AnalysisConfig.SHARDING_MIN_PAGES:
+                exports = await self._conversion_pool.convert_sharded(path)
+            else:
+                exports = await self._conversion_pool.convert(path, output_types=tuple(PdfFile.EXPORT_EXTENSIONS))
+            await loop.run_in_executor(
+                self._convert_executor,
+                ConversionCache.put, path, exports, PdfFile.converter_options()
+            )
+            item.markdown = exports["markdown"]
+
+        if item.markdown is not None and item.with_chunks:
+            item.semantic_chunks = await loop.run_in_executor(
+                self._convert_executor, self.semantic_chunks, path, ModelsConfig.SUMMARIZER.tokenizer, exports.get("json")
+            )
+
+        if self._incremental:
+            self._plan_changed_stages(item)
+
+    @staticmethod
+    def semantic_chunks(path: str, tokenizer=None, document: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Structure aligned chunks of a converted pdf, from its docling document (`document`, or the json export in
+        the conversion cache). They are stored next to the exports and reused while the chunk settings are the same.
+        Empty when there is no docling structure, e.g. for streamed conversions.
+        """
+        chunks_path = AnalysisPipeline._chunks_path(path)
+        settings    = {
+            "tokenizer":  TokenizedDocument.tokenizer_key(tokenizer) if tokenizer is not None else None,
+            "max_tokens": AnalysisConfig.STRUCTURE_CHUNK_MAX_TOKENS,
+            "min_tokens": AnalysisConfig.STRUCTURE_CHUNK_MIN_TOKENS,
+        }
+        chunks = AnalysisPipeline._load_chunks(chunks_path, settings)
+        if chunks is not None:
+            return chunks
+
+        if document is None:
+            document = ConversionCache.get(path, "json", PdfFile.converter_options())
+        if document is None:
+            return []
+        chunks = StructureChunker.iter_chunks(document, tokenizer=tokenizer, max_tokens=settings["max_tokens"], min_tokens=settings["min_tokens"])
+        chunks = [chunk.to_dict() for chunk in chunks]
+        AnalysisPipeline._save_chunks(chunks_path, settings, chunks)
+        return chunks
+
+    @staticmethod
+    def _chunks_path(path: str) -> Path:
+        return ConversionCache.entry_file(path, "document.chunks.json", PdfFile.converter_options())
+
+    @staticmethod
+    def _load_chunks(chunks_path: Path, settings: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        if not chunks_path.exists():
+            return None
+        try:
+            with chunks_path.open("r", encoding="utf-8") as fp:
+                stored = json.load(fp)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Pipeline - Could not load {chunks_path}, chunking again: {str(e)}")
+            return None
+        return stored["chunks"] if stored.get("settings") == settings else None
+
+    @staticmethod
+    def _save_chunks(chunks_path: Path, settings: Dict[str, Any], chunks: List[Dict[str, Any]]):
+        chunks_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = chunks_path.with_name(f".{chunks_path.name}.tmp")
+        with temp_path.open("w", encoding="utf-8") as fp:
+            json.dump({"settings": settings, "chunks": chunks}, fp)
+        os.replace(temp_path, chunks_path)
+
+    def _is_unchanged(self, item: PipelineItem) -> bool:
+        previous = item.previous
+        return (
+            previous is not None
+            and previous.markdown_hash is not None
+            and self._is_reusable_summary(previous, item.profile)
+            and item.fingerprint.matches(previous.fingerprint)
+        )
+
+    def _is_reusable_summary(self, previous: AnalysisState, profile: str) -> bool:
+        """A summary made with the same or a better generation profile than the requested one is kept, an empty one never."""
+        if not previous.summary:
+            return False
+        better_profiles = GenerationProfile.ALL[GenerationProfile.ALL.index(profile):]
+        return previous.summary_signature in (self._summary_signatures[p] for p in better_profiles)
+
+    def _plan_changed_stages(self, item: PipelineItem):
+        """The file changed (or the summarizer did): reuse the outputs of the stages whose inputs are the same."""
+        if item.markdown is not None:
+            item.markdown_hash = hashlib.sha256(item.markdown.encode("utf-8")).hexdigest()
+        previous = item.previous
+        if previous is None:
+            return
+        if (
+            item.markdown_hash is not None
+            and previous.markdown_hash == item.markdown_hash
+            and self._is_reusable_summary(previous, item.profile)
+        ):
+            item.summary = previous.summary
+            item.skip_stages.add("summarize")
+        if item.fingerprint.matches(previous.fingerprint) and previous.metadata is not None:
+            item.metadata = previous.metadata
+            item.skip_stages.add("metadata")
+        logger.debug(f"Pipeline - Incremental analysis of {item.hnode.fs_full_path} skips: {sorted(item.skip_stages) or 'nothing'}")
+
+    async def _summarize(self, item: PipelineItem):
+        if item.cancellation is not None:
+            item.cancellation.start()
+        await self._inference.run(self._load_summarizer)
+        on_chunk_summary = None
+        if item.events is not None:
+            on_chunk_summary = lambda index, summary: item.events.emit(AnalysisEvent.CHUNK_SUMMARY, {"index": index, "summary": summary})
+        if item.stream:
+            item.summary, item.markdown_hash = await self._summarize_streamed(item, on_chunk_summary)
+        else:
+            item.tokens  = await self._inference.run(self._load_tokens, item.hnode.fs_full_path, item.markdown)
+            item.summary = await self._inference.run(
+                self._summarizer.summarize_text, item.tokens, 1, item.profile, cancellation=item.cancellation, on_chunk_summary=on_chunk_summary
+            )
+            if AnalysisConfig.PERSIST_TOKENS and item.tokens.is_dirty:
+                await self._inference.run(item.tokens.save, self._tokens_path(item.hnode.fs_full_path))
+
+    def _load_summarizer(self):
+        # Runs on the inference thread, so the summarize lanes never load the model twice.
+        if self._summarizer is None:
+            self._summarizer = TextSummarizer()
+
+    @staticmethod
+    def _tokens_path(path: str) -> Path:
+        return ConversionCache.entry_file(path, "document.tokens.npz", PdfFile.converter_options())
+
+    @staticmethod
+    def _load_tokens(path: str, markdown: str) -> TokenizedDocument:
+        if not AnalysisConfig.PERSIST_TOKENS:
+            return TokenizedDocument(markdown)
+        return TokenizedDocument.load(markdown, AnalysisPipeline._tokens_path(path))
+
+    async def _summarize_streamed(self, item: PipelineItem, on_chunk_summary: Optional[Callable[[int, str], None]] = None):
+        """
+        Summarize page windows as the conversion pool produces them. Windows are awaited here, on the event loop,
+        and every batch of windows ready so far is summarized by one inference call; the chunk summaries of all the
+        batches are reduced once the last window is in. The streamed markdown ends up in the conversion cache.
+        """
+        loop = asyncio.get_running_loop()
+        path = item.hnode.fs_full_path
+        ConversionCache.ROOT_PATH.mkdir(parents=True, exist_ok=True)
+        fd, sink_path = tempfile.mkstemp(dir=ConversionCache.ROOT_PATH, prefix=".stream-", suffix=".md")
+        os.close(fd)
+        digest   = hashlib.sha256()
+        windows  = asyncio.Queue(AnalysisConfig.STREAMING_QUEUE_WINDOWS)
+        producer = asyncio.create_task(self._produce_windows(path, Path(sink_path), digest, windows))
+        chunk_summaries: List[str] = []
+        try:
+            completed = False
+            while not completed:
+                batch = [await self._next_window(windows, item.cancellation)]
+                while not windows.empty():
+                    batch.append(windows.get_nowait())
+                for window in batch:
+                    if isinstance(window, Exception):
+                        raise window
+                completed = batch[-1] is _END_OF_WINDOWS
+                texts     = [window for window in batch if window is not _END_OF_WINDOWS]
+                if texts:
+                    offset = len(chunk_summaries)
+                    chunk_summaries += await self._inference.run(
+                        self._summarizer.summarize_windows, texts, item.profile, cancellation=item.cancellation,
+                        on_chunk_summary=(lambda index, summary: on_chunk_summary(offset + index, summary)) if on_chunk_summary is not None else None
+                    )
+            await producer
+            summary = await self._inference.run(self._summarizer.reduce_summaries, chunk_summaries, item.profile, cancellation=item.cancellation)
+            await loop.run_in_executor(
+                self._convert_executor, ConversionCache.put_file, path, "markdown", Path(sink_path), PdfFile.converter_options()
+            )
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+            if os.path.exists(sink_path):
+                os.remove(sink_path)
+        return summary, digest.hexdigest()
+
+    @staticmethod
+    async def _next_window(windows: asyncio.Queue, cancellation: Optional[CancellationToken]):
+        """Next streamed window, checking the deadline and the file while the conversion pool is on it."""
+        while True:
+            if cancellation is not None:
+                cancellation.raise_if_cancelled()
+            try:
+                return await asyncio.wait_for(windows.get(), timeout=_WINDOW_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                continue
+
+    async def _produce_windows(self, path: str, sink_path: Path, digest, windows: asyncio.Queue):
+        """Page windows of the pdf from the conversion pool into `windows`, then the end marker, or the error."""
+        loop = asyncio.get_running_loop()
+        try:
+            with sink_path.open("w", encoding="utf-8") as sink:
+                async for markdown in self._conversion_pool.stream_markdown(path, AnalysisConfig.STREAMING_WINDOW_PAGES):
+                    await loop.run_in_executor(self._convert_executor, self._append_window, sink, digest, markdown)
+                    await windows.put(markdown)
+        except Exception as e:
+            await windows.put(e)
+            raise
+        await windows.put(_END_OF_WINDOWS)
+
+    @staticmethod
+    def _append_window(sink, digest, markdown: str):
+        # Hash exactly what is written to the sink, so it matches the cached markdown hash next time.
+        window = markdown + "\n\n"
+        sink.write(window)
+        digest.update(window.encode("utf-8"))
+
+    async def _extract_metadata(self, item: PipelineItem):
+        item.metadata = await self._worker_pool.run_in_process(PdfFile.extract_metadata, item.hnode.fs_full_path)
+
+    async def _store(self, item: PipelineItem):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._store_executor, HnodeCollection.upsert_hnode_by_id, item.hnode.id, item.data)
+        if self._incremental:
+            # A reused summary keeps the signature of the profile it was generated with.
+            if "summarize" in item.skip_stages and item.previous is not None:
+                summary_signature = item.previous.summary_signature
+            elif item.summary:
+                summary_signature = self._summary_signatures[item.profile]
+            else:
+                # Summarization failed (the summarizer logs it and returns ""): no signature, so the next run retries.
+                summary_signature = None
+            state = AnalysisState(
+                hyper_node_id=item.hnode.id,
+                fingerprint=item.fingerprint,
+                markdown_hash=item.markdown_hash,
+                summary_signature=summary_signature,
+                summary=item.summary,
+                metadata=item.metadata,
+            )
+            semantics_changed = item.previous is None or item.previous.summary != item.summary
+            await loop.run_in_executor(self._store_executor, AnalysisStateRepository.save, state, semantics_changed)
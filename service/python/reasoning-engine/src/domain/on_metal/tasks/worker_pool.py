@@ -0,0 +1,213 @@
+import asyncio
+import time
+import uuid
+from collections        import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses        import dataclass, field
+from typing             import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.config.workers_config import WorkersConfig
+
+from src.domain.on_metal.logger import get_logger
+logger = get_logger(__name__)
+
+
+class TaskState:
+    QUEUED  = "queued"
+    RUNNING = "running"
+    DONE    = "done"
+    FAILED  = "failed"
+
+    FINISHED = (DONE, FAILED)
+
+
+@dataclass
+class TaskProgress:
+    task_id:       int
+    hyper_node_id: Optional[str]
+    name:          str
+    state:         str             = TaskState.QUEUED
+    error:         Optional[str]   = None
+    queued_at:     float           = field(default_factory=time.time)
+    started_at:    Optional[float] = None
+    finished_at:   Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "task_id":       self.task_id,
+            "hyper_node_id": self.hyper_node_id,
+            "name":          self.name,
+            "state":         self.state,
+            "error":         self.error,
+            "queued_at":     self.queued_at,
+            "started_at":    self.started_at,
+            "finished_at":   self.finished_at,
+        }
+
+
+@dataclass
+class Job:
+    id:         str
+    tasks:      Dict[int, TaskProgress] = field(default_factory=dict)
+    created_at: float                   = field(default_factory=time.time)
+    # True while a producer is still adding tasks to the job (e.g. leasing them batch by batch).
+    is_feeding: bool                    = False
+
+    @property
+    def is_finished(self) -> bool:
+        return not self.is_feeding and all(progress.state in TaskState.FINISHED for progress in self.tasks.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        counts = {state: 0 for state in (TaskState.QUEUED, TaskState.RUNNING, TaskState.DONE, TaskState.FAILED)}
+        for progress in self.tasks.values():
+            counts[progress.state] += 1
+
+        return {
+            "job_id":      self.id,
+            "created_at":  self.created_at,
+            "is_finished": self.is_finished,
+            "is_feeding":  self.is_feeding,
+            "num_tasks":   len(self.tasks),
+            "counts":      counts,
+            "tasks":       [progress.to_dict() for progress in self.tasks.values()],
+        }
+
+
+class WorkerPool:
+    """
+    Persistent background workers living alongside the FastAPI app.
+    Async workers drain a job queue calling `handler(task)`; process workers are exposed through
+    `run_in_process` for CPU bound steps of the handler. Tasks still queued when the pool stops are
+    handed to `release(task)`, e.g. to give their lease back.
+    """
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[Any]],
+        num_async_workers: int   = WorkersConfig.NUM_ASYNC_WORKERS,
+        num_process_workers: int = WorkersConfig.NUM_PROCESS_WORKERS,
+        queue_max_size: int      = WorkersConfig.QUEUE_MAX_SIZE,
+        release: Optional[Callable[[Any], Awaitable[Any]]] = None,
+    ):
+        self._handler             = handler
+        self._release             = release
+        self._num_async_workers   = max(1, num_async_workers)
+        self._num_process_workers = max(1, num_process_workers)
+        self._queue_max_size      = queue_max_size
+        self._queue: Optional[asyncio.Queue]                 = None
+        self._workers: List[asyncio.Task]                    = []
+        self._process_executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: "OrderedDict[str, Job]"                  = OrderedDict()
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        if self.is_running:
+            return
+        logger.info(f"> Starting worker pool: {self._num_async_workers} async workers, {self._num_process_workers} process workers.")
+        self._queue            = asyncio.Queue(maxsize=self._queue_max_size)
+        self._process_executor = ProcessPoolExecutor(max_workers=self._num_process_workers)
+        self._workers          = [
+            asyncio.create_task(self._worker(index), name=f"task-worker-{index}")
+            for index in range(self._num_async_workers)
+        ]
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        logger.info("> Stopping worker pool...")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self._release_queued()
+        self._process_executor.shutdown(wait=False, cancel_futures=True)
+        self._process_executor = None
+
+    def create_job(self, is_feeding: bool = False) -> Job:
+        job = Job(id=uuid.uuid4().hex, is_feeding=is_feeding)
+        self._jobs[job.id] = job
+        self._prune_finished_jobs()
+        return job
+
+    async def submit(self, tasks: List[Any], job: Optional[Job] = None) -> Job:
+        """Queue tasks on a new job, or append them to a job created with `create_job`. Blocks while the queue is full."""
+        if not self.is_running:
+            raise RuntimeError("Worker pool is not running.")
+
+        if job is None:
+            job = self.create_job()
+        for task in tasks:
+            job.tasks[task.id] = TaskProgress(task_id=task.id, hyper_node_id=task.hyper_node_id, name=task.name)
+
+        for index, task in enumerate(tasks):
+            if not self.is_running:
+                # Stopped while waiting for room in the queue: the remaining tasks never make it in.
+                for unqueued in tasks[index:]:
+                    await self._release_task(job, unqueued)
+                raise RuntimeError("Worker pool is not running.")
+            await self._queue.put((job, task))
+        logger.debug(f">> Job {job.id} queued {len(tasks)} tasks.")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def run_in_process(self, fn: Callable, *args):
+        """Run a picklable callable in the process workers and await its result."""
+        if self._process_executor is None:
+            raise RuntimeError("Worker pool is not running.")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._process_executor, fn, *args)
+
+    async def _worker(self, index: int):
+        while True:
+            job, task = await self._queue.get()
+            progress  = job.tasks[task.id]
+            try:
+                progress.state      = TaskState.RUNNING
+                progress.started_at = time.time()
+                await self._handler(task)
+                progress.state      = TaskState.DONE
+            except asyncio.CancelledError:
+                progress.state = TaskState.FAILED
+                progress.error = "Cancelled"
+                raise
+            except Exception as e:
+                logger.error(f"Worker {index} failed on task {task.id}: {str(e)}", exc_info=True)
+                progress.state = TaskState.FAILED
+                progress.error = str(e)
+            finally:
+                progress.finished_at = time.time()
+                self._queue.task_done()
+
+    async def _release_queued(self):
+        """Release the tasks no worker started. Submitters blocked on the full queue get woken by the drain, so loop."""
+        released = 0
+        while not self._queue.empty():
+            while not self._queue.empty():
+                job, task = self._queue.get_nowait()
+                self._queue.task_done()
+                await self._release_task(job, task)
+                released += 1
+            await asyncio.sleep(0)
+        if released:
+            logger.info(f"> Worker pool released {released} queued tasks.")
+
+    async def _release_task(self, job: Job, task: Any):
+        progress = job.tasks[task.id]
+        progress.state       = TaskState.FAILED
+        progress.error       = "Released, the worker pool stopped before it started"
+        progress.finished_at = time.time()
+        if self._release is None:
+            return
+        try:
+            await self._release(task)
+        except Exception as e:
+            logger.error(f"Failed releasing task {task.id}: {str(e)}", exc_info=True)
+
+    def _prune_finished_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(finished) - WorkersConfig.MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
@@ -1,27 +1,67 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 
 import os
 import sys
 import logging
 
-from src.domain.on_metal.logger       import init_logging, get_logger
-from src.controllers.tasks_controller import TasksController
+from src.domain.on_metal.logger                  import init_logging, get_logger
+from src.domain.on_metal.tasks.worker_pool       import WorkerPool
+from src.domain.on_metal.tasks.analysis_pipeline import AnalysisPipeline
+from src.domain.on_metal.file.conversion_pool    import ConversionPool
+from src.controllers.tasks_controller            import TasksController
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The worker pool handler is the controller, which in turn feeds the pipeline running on the pool.
+    tasks_controller = TasksController(worker_pool=None)
+    worker_pool      = WorkerPool(handler=tasks_controller.perform_task, release=tasks_controller.release_task)
+    conversion_pool  = ConversionPool()
+    pipeline         = AnalysisPipeline(worker_pool=worker_pool, conversion_pool=conversion_pool)
+    tasks_controller.worker_pool = worker_pool
+    tasks_controller.pipeline    = pipeline
+
+    app.state.tasks_controller = tasks_controller
+    await worker_pool.start()
+    conversion_pool.start()
+    await pipeline.start()
+    try:
+        yield
+    finally:
+        await pipeline.stop()
+        conversion_pool.stop()
+        await worker_pool.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/hello")
 async def root():
     return {"message": "Status Online"}
-    
+
 @app.get("/consume_tasks")
 async def consume_tasks():
-    tasks_controller = TasksController()
-    result = await tasks_controller.consume_tasks_table()
+    result = await app.state.tasks_controller.consume_tasks_table()
     return result
 
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return app.state.tasks_controller.get_job_status(job_id)
+
+@app.get("/analyze/{hyper_node_id}/stream")
+async def analyze_stream(hyper_node_id: str):
+    event_stream = await app.state.tasks_controller.stream_analysis(hyper_node_id)
+    return StreamingResponse(
+        event_stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 if __name__ == "__main__":
     # Initialize with custom settings
     init_logging(
@@ -29,11 +69,10 @@ if __name__ == "__main__":
         level=logging.INFO,
         log_file="fastapi.log"
     )
-    
+
     logger = get_logger(__name__)
     logger.info("> Application started")
 
     logger.info("> Starting FastAPI server...")
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
-
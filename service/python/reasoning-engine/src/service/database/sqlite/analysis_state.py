@@ -0,0 +1,82 @@
+import json
+import sqlite3
+from dataclasses import dataclass
+from typing      import Any, Dict, Optional
+
+from src.domain.on_metal.file.fingerprint import FileFingerprint
+from src.service.database.sqlite_db       import SQLite
+
+
+@dataclass
+class AnalysisState:
+    hyper_node_id:     str
+    fingerprint:       FileFingerprint
+    markdown_hash:     Optional[str]
+    summary_signature: Optional[str]
+    summary:           Optional[str]
+    metadata:          Optional[Dict[str, Any]]
+    analyzed_at:       Optional[str] = None
+
+
+class AnalysisStateRepository:
+    """Reads / writes the `hyper_node_analysis` table holding the last analysis of each hyper_node."""
+    @staticmethod
+    def get(hyper_node_id: str) -> Optional[AnalysisState]:
+        connection = SQLite().get_connection()
+        connection.row_factory = sqlite3.Row
+        try:
+            row = connection.execute(
+                "SELECT * FROM hyper_node_analysis WHERE hyper_node_id = ?",
+                (hyper_node_id,)
+            ).fetchone()
+        finally:
+            connection.close()
+
+        if row is None:
+            return None
+        return AnalysisState(
+            hyper_node_id=row["hyper_node_id"],
+            fingerprint=FileFingerprint(
+                inode=row["fs_inode"],
+                size=row["fs_file_size"],
+                mtime_ns=row["fs_mtime_ns"],
+                sampled_hash=row["fs_sampled_hash"],
+            ),
+            markdown_hash=row["markdown_hash"],
+            summary_signature=row["summary_signature"],
+            summary=row["summary"],
+            metadata=json.loads(row["metadata"]) if row["metadata"] else None,
+            analyzed_at=row["analyzed_at"],
+        )
+
+    @staticmethod
+    def save(state: AnalysisState, semantics_changed: bool):
+        connection = SQLite().get_connection()
+        try:
+            with connection:
+                connection.execute(
+                    """
+                    INSERT OR REPLACE INTO hyper_node_analysis (
+                        hyper_node_id, fs_inode, fs_file_size, fs_mtime_ns, fs_sampled_hash,
+                        markdown_hash, summary_signature, summary, metadata, analyzed_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+                    """,
+                    (
+                        state.hyper_node_id,
+                        state.fingerprint.inode,
+                        state.fingerprint.size,
+                        state.fingerprint.mtime_ns,
+                        state.fingerprint.sampled_hash,
+                        state.markdown_hash,
+                        state.summary_signature,
+                        state.summary,
+                        json.dumps(state.metadata, default=str) if state.metadata is not None else None,
+                    )
+                )
+                if semantics_changed:
+                    connection.execute(
+                        "UPDATE hyper_node SET last_updated_semantics_changes = datetime('now') WHERE id = ?",
+                        (state.hyper_node_id,)
+                    )
+        finally:
+            connection.close()
@@ -0,0 +1,178 @@
+import os
+import socket
+import sqlite3
+from dataclasses import dataclass, fields
+from typing      import Dict, List, Optional, Sequence
+
+from src.config.workers_config      import WorkersConfig
+from src.service.database.sqlite_db import SQLite
+
+from src.domain.on_metal.logger import get_logger
+logger = get_logger(__name__)
+
+
+class TaskStatus:
+    PENDING   = "pending"
+    LEASED    = "leased"
+    COMPLETED = "completed"
+    FAILED    = "failed"
+
+
+@dataclass
+class HyperNodeRow:
+    """Scalar columns of a `hyper_node` row needed to analyze it (embeddings and blobs are left out)."""
+    id:                             str
+    name:                           str
+    parent_hyper_node_id:           Optional[str]
+    created_at:                     Optional[str]
+    updated_at:                     Optional[str]
+    is_folder:                      int
+    is_file:                        int
+    is_inside_fs_file:              int
+    fs_full_path:                   str
+    fs_file_name:                   Optional[str]
+    fs_inode:                       Optional[int]
+    fs_file_extension:              Optional[str]
+    fs_file_size:                   Optional[int]
+    fs_device_id:                   Optional[int]
+    last_updated_semantics_changes: Optional[str]
+
+
+@dataclass
+class LeasedTask:
+    id:               int
+    hyper_node_id:    Optional[str]
+    name:             str
+    description:      Optional[str]
+    status:           str
+    priority:         int
+    created_at:       Optional[str]
+    leased_by:        Optional[str]
+    lease_expires_at: Optional[str]
+    hnode:            Optional[HyperNodeRow] = None
+
+
+_TASK_COLUMNS  = "id, hyper_node_id, name, description, status, priority, created_at, leased_by, lease_expires_at"
+_HNODE_COLUMNS = [f.name for f in fields(HyperNodeRow)]
+# Stay well below SQLITE_MAX_VARIABLE_NUMBER (999 on older builds).
+_IN_LIST_BATCH_SIZE = 500
+
+_RECLAIM_EXPIRED_SQL = f"""
+    UPDATE task
+    SET status = '{TaskStatus.PENDING}', leased_by = NULL, lease_expires_at = NULL
+    WHERE status = '{TaskStatus.LEASED}' AND lease_expires_at < datetime('now')
+"""
+
+# Single statement: the sub-select walks idx_task_claim and stops after `limit` rows, so the claim cost
+# does not depend on the table size, and the UPDATE makes the claim atomic across connections.
+_LEASE_SQL = f"""
+    UPDATE task
+    SET status = '{TaskStatus.LEASED}', leased_by = :worker_id, lease_expires_at = datetime('now', :lease_modifier)
+    WHERE id IN (
+        SELECT id FROM task
+        WHERE status = '{TaskStatus.PENDING}' AND (:name IS NULL OR name = :name)
+        ORDER BY priority DESC, created_at ASC
+        LIMIT :limit
+    )
+    RETURNING {_TASK_COLUMNS}
+"""
+
+
+class TaskQueue:
+    """Lease based access to the SQLite `task` table. Every write is scoped to the leases owned by `worker_id`."""
+    def __init__(self, worker_id: Optional[str] = None, lease_seconds: int = WorkersConfig.LEASE_SECONDS):
+        self.worker_id     = worker_id or TaskQueue.default_worker_id()
+        self.lease_seconds = lease_seconds
+
+    @staticmethod
+    def default_worker_id() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def lease(self, limit: int = WorkersConfig.LEASE_BATCH_SIZE, name: Optional[str] = None) -> List[LeasedTask]:
+        """Claim up to `limit` pending tasks in priority / created_at order, reclaiming expired leases first."""
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            reclaimed = connection.execute(_RECLAIM_EXPIRED_SQL).rowcount
+            rows = connection.execute(_LEASE_SQL, {
+                "worker_id":      self.worker_id,
+                "lease_modifier": f"+{self.lease_seconds} seconds",
+                "name":           name,
+                "limit":          limit,
+            }).fetchall()
+            hnodes = TaskQueue._fetch_hnodes(connection, [row["hyper_node_id"] for row in rows])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+        if reclaimed:
+            logger.info(f"TaskQueue - Reclaimed {reclaimed} expired task leases.")
+        # RETURNING does not honour the sub-select order.
+        tasks = sorted(
+            (LeasedTask(**dict(row), hnode=hnodes.get(row["hyper_node_id"])) for row in rows),
+            key=lambda t: (-t.priority, t.created_at or "", t.id)
+        )
+        logger.debug(f"TaskQueue - {self.worker_id} leased {len(tasks)} tasks.")
+        return tasks
+
+    def renew(self, task_id: int) -> bool:
+        """Extend a lease. Returns False when the lease was lost (expired and reclaimed by another worker)."""
+        return self._update_owned(
+            task_id,
+            "lease_expires_at = datetime('now', ?)",
+            (f"+{self.lease_seconds} seconds",)
+        )
+
+    def complete(self, task_id: int) -> bool:
+        return self._update_owned(
+            task_id,
+            f"status = '{TaskStatus.COMPLETED}', performed_at = datetime('now'), leased_by = NULL, lease_expires_at = NULL"
+        )
+
+    def fail(self, task_id: int) -> bool:
+        return self._update_owned(
+            task_id,
+            f"status = '{TaskStatus.FAILED}', performed_at = datetime('now'), leased_by = NULL, lease_expires_at = NULL"
+        )
+
+    def release(self, task_id: int) -> bool:
+        """Give a lease back so the task can be claimed again right away."""
+        return self._update_owned(
+            task_id,
+            f"status = '{TaskStatus.PENDING}', leased_by = NULL, lease_expires_at = NULL"
+        )
+
+    def _update_owned(self, task_id: int, set_clause: str, params: tuple = ()) -> bool:
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                f"UPDATE task SET {set_clause} WHERE id = ? AND status = '{TaskStatus.LEASED}' AND leased_by = ?",
+                (*params, task_id, self.worker_id)
+            )
+            return cursor.rowcount == 1
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _fetch_hnodes(connection: sqlite3.Connection, hyper_node_ids: Sequence[Optional[str]]) -> Dict[str, HyperNodeRow]:
+        """Bulk hyper_node lookup with batched IN-lists on an already open connection."""
+        ids    = list({hyper_node_id for hyper_node_id in hyper_node_ids if hyper_node_id is not None})
+        hnodes = {}
+        for start in range(0, len(ids), _IN_LIST_BATCH_SIZE):
+            batch = ids[start:start + _IN_LIST_BATCH_SIZE]
+            rows  = connection.execute(
+                f"SELECT {', '.join(_HNODE_COLUMNS)} FROM hyper_node WHERE id IN ({', '.join('?' * len(batch))})",
+                batch
+            ).fetchall()
+            hnodes.update({row["id"]: HyperNodeRow(**dict(row)) for row in rows})
+        return hnodes
+
+    @staticmethod
+    def _connect() -> sqlite3.Connection:
+        connection = SQLite().get_connection()
+        connection.row_factory     = sqlite3.Row
+        connection.isolation_level = None  # Explicit transactions, see `lease`.
+        return connection